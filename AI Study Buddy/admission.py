@@ -0,0 +1,268 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class AdmissionControl:
+    """Per-client token buckets plus a global in-flight cap, kept in SQLite.
+
+    Each client gets ``rate`` requests per second with bursts of up to
+    ``burst`` (a rate of 0 turns the per-client limit off). At most
+    ``max_in_flight`` admitted requests run at once across every worker
+    process sharing ``path``; up to ``max_waiting`` more wait as long as
+    ``max_wait`` seconds for a slot. Anything beyond that is refused at
+    once with a Retry-After hint. Slots are leased so a crashed worker
+    cannot leak capacity; a live process renews the leases it holds until
+    they are released, however long the request runs. Store errors fail
+    open.
+    """
+
+    def __init__(self, path, rate=1.0, burst=5, max_in_flight=32,
+                 max_waiting=64, max_wait=2.0, lease_seconds=120,
+                 poll_interval=0.05):
+        self.path = path
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._held = set()
+        self._renewer = None
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS buckets (
+                       client TEXT PRIMARY KEY,
+                       tokens REAL NOT NULL,
+                       updated REAL NOT NULL
+                   )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS buckets_updated"
+                " ON buckets (updated)"
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS slots (
+                       ticket TEXT PRIMARY KEY,
+                       state TEXT NOT NULL,
+                       expires REAL NOT NULL
+                   )"""
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _take_token(self, client):
+        """Spend one of ``client``'s tokens; returns seconds until one frees"""
+        now = time.time()
+        with self._transaction() as conn:
+            # A bucket untouched for burst / rate seconds is full again
+            conn.execute("DELETE FROM buckets WHERE updated < ?",
+                         (now - self.burst / self.rate,))
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE client = ?",
+                (client,)
+            ).fetchone()
+            tokens = self.burst
+            if row:
+                tokens = min(self.burst, row[0] + (now - row[1]) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (client, tokens, updated)"
+                " VALUES (?, ?, ?)",
+                (client, tokens, now)
+            )
+        return wait
+
+    def _enter(self, ticket, waiting):
+        """Try to move ``ticket`` into a running slot.
+
+        Returns "running", "waiting" (queued for a slot) or "full".
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM slots WHERE expires <= ?", (now,))
+            (running,) = conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE state = 'running'"
+            ).fetchone()
+            if running < self.max_in_flight:
+                conn.execute(
+                    "INSERT OR REPLACE INTO slots (ticket, state, expires)"
+                    " VALUES (?, 'running', ?)",
+                    (ticket, now + self.lease_seconds)
+                )
+                return "running"
+            if waiting:
+                return "waiting"
+            (queued,) = conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE state = 'waiting'"
+            ).fetchone()
+            if queued >= self.max_waiting:
+                return "full"
+            conn.execute(
+                "INSERT INTO slots (ticket, state, expires)"
+                " VALUES (?, 'waiting', ?)",
+                (ticket, now + self.max_wait + 1)
+            )
+            return "waiting"
+
+    def _reject(self, counter, retry_after):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        return None, max(1, math.ceil(retry_after))
+
+    def _admit_steps(self, client):
+        """Generator behind admit/admit_async; yields while awaiting a slot"""
+        try:
+            wait = self._take_token(client) if self.rate > 0 else 0
+        except sqlite3.Error as e:
+            print(f"Admission warning: rate limit skipped - {e}")
+            wait = 0
+        if wait:
+            return self._reject("rate_limited", wait)
+
+        ticket = uuid.uuid4().hex
+        deadline = time.monotonic() + self.max_wait
+        state = None
+        while True:
+            try:
+                state = self._enter(ticket, state == "waiting")
+            except sqlite3.Error as e:
+                print(f"Admission warning: in-flight cap skipped - {e}")
+                state = "running"
+            if state == "running":
+                with self._lock:
+                    self.admitted += 1
+                    self._held.add(ticket)
+                    self._start_renewer()
+                return ticket, 0
+            if state == "full" or time.monotonic() >= deadline:
+                self.release(ticket)
+                return self._reject("overloaded", self.max_wait)
+            yield
+
+    def admit(self, client):
+        """Admit a request from ``client``, waiting briefly for a slot.
+
+        Returns ``(ticket, 0)`` when admitted; pass the ticket to
+        ``release`` once the request is done. Returns ``(None,
+        retry_after_seconds)`` when the request should get a 429.
+        """
+        steps = self._admit_steps(client)
+        try:
+            while True:
+                next(steps)
+                time.sleep(self.poll_interval)
+        except StopIteration as done:
+            return done.value
+
+    async def admit_async(self, client):
+        """Async counterpart of admit.
+
+        Each step's SQLite work runs in a thread so a busy database never
+        blocks the event loop; the waits between steps use asyncio.sleep.
+        """
+        steps = self._admit_steps(client)
+        while True:
+            finished, result = await asyncio.to_thread(_step, steps)
+            if finished:
+                return result
+            await asyncio.sleep(self.poll_interval)
+
+    def _start_renewer(self):
+        # Started on first use, so a worker forked after import gets its own
+        if self._renewer is None or not self._renewer.is_alive():
+            self._renewer = threading.Thread(target=self._renew,
+                                             name="admission-renew",
+                                             daemon=True)
+            self._renewer.start()
+
+    def _renew(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._lock:
+                tickets = list(self._held)
+            if not tickets:
+                continue
+            try:
+                self._connect().executemany(
+                    "UPDATE slots SET expires = ? WHERE ticket = ?",
+                    [(time.time() + self.lease_seconds, ticket)
+                     for ticket in tickets]
+                )
+            except sqlite3.Error as e:
+                print(f"Admission warning: lease renewal failed - {e}")
+
+    def release(self, ticket):
+        with self._lock:
+            self._held.discard(ticket)
+        try:
+            self._connect().execute("DELETE FROM slots WHERE ticket = ?",
+                                    (ticket,))
+        except sqlite3.Error as e:
+            print(f"Admission warning: release failed - {e}")
+
+    def stats(self):
+        """Admission counters for this process and shared slot usage"""
+        try:
+            counts = dict(self._connect().execute(
+                "SELECT state, COUNT(*) FROM slots WHERE expires > ?"
+                " GROUP BY state",
+                (time.time(),)
+            ).fetchall())
+        except sqlite3.Error:
+            counts = {}
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "overloaded": self.overloaded,
+                "in_flight": counts.get("running", 0),
+                "waiting": counts.get("waiting", 0),
+            }
+
+
+def _step(steps):
+    # StopIteration cannot cross asyncio.to_thread, so report it as a value
+    try:
+        next(steps)
+        return False, None
+    except StopIteration as done:
+        return True, done.value
@@ -1,12 +1,34 @@
+import asyncio
+import json
 import os
+import queue
+import socket
+import threading
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+import metrics
+from cache import ResultCache, make_cache_key
+from ratelimit import RateLimiter
+from hedging import LatencyTracker, hedged_call, hedged_call_async
+from question_bank import QuestionBank
+from singleflight import SingleFlight
+from qa_parser import QAStreamParser, merge_questions, parse_response
 
 load_dotenv()
 
 API_KEY = os.getenv("OPENROUTER_API_KEY")
-BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+BASE_URL = os.getenv("OPENROUTER_BASE_URL",
+                     "https://openrouter.ai/api/v1/chat/completions")
 
 HEADERS = {
     "Authorization": f"Bearer {API_KEY}",
@@ -15,9 +37,500 @@ HEADERS = {
     "X-Title": "Study Buddy AI"
 }
 
+POOL_SIZE = int(os.getenv("STUDY_BUDDY_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("STUDY_BUDDY_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("STUDY_BUDDY_READ_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("STUDY_BUDDY_MAX_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("STUDY_BUDDY_RETRY_BACKOFF", "0.5"))
+MAX_RETRY_AFTER = float(os.getenv("STUDY_BUDDY_MAX_RETRY_AFTER", "10"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_CONCURRENCY = int(os.getenv("STUDY_BUDDY_MAX_CONCURRENCY", "200"))
 
-def generate_study_questions(topic, difficulty, num_questions=5):
-    """Generate study questions using OpenRouter API"""
+MODELS = [m.strip() for m in
+          os.getenv("STUDY_BUDDY_MODELS", "openai/gpt-4o-mini").split(",")
+          if m.strip()]
+HEDGE_PERCENTILE = float(os.getenv("STUDY_BUDDY_HEDGE_PERCENTILE", "0.9"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("STUDY_BUDDY_HEDGE_DEFAULT_DELAY", "8"))
+HEDGE_MIN_DELAY = float(os.getenv("STUDY_BUDDY_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_WORKERS = int(os.getenv("STUDY_BUDDY_HEDGE_WORKERS", "32"))
+
+CHUNK_SIZE = int(os.getenv("STUDY_BUDDY_CHUNK_SIZE", "5"))
+CHUNK_WORKERS = int(os.getenv("STUDY_BUDDY_CHUNK_WORKERS", "16"))
+# Extra requests for questions lost to de-duplication or a short reply
+TOP_UP_ROUNDS = int(os.getenv("STUDY_BUDDY_TOP_UP_ROUNDS", "1"))
+
+BATCH_WORKERS = int(os.getenv("STUDY_BUDDY_BATCH_WORKERS", "8"))
+BATCH_RATE = float(os.getenv("STUDY_BUDDY_BATCH_RATE", "5"))
+
+CACHE_DB = os.getenv(
+    "STUDY_BUDDY_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 "study_buddy_cache.db")
+)
+CACHE_TTL = int(os.getenv("STUDY_BUDDY_CACHE_TTL", "86400"))
+CACHE_MEMORY_ITEMS = int(os.getenv("STUDY_BUDDY_CACHE_SIZE", "256"))
+CACHE_DISK_ITEMS = int(os.getenv("STUDY_BUDDY_CACHE_MAX_ROWS", "10000"))
+
+result_cache = ResultCache(
+    path=CACHE_DB or None,
+    ttl=CACHE_TTL,
+    max_memory_items=CACHE_MEMORY_ITEMS,
+    max_disk_items=CACHE_DISK_ITEMS
+)
+
+BANK_DB = os.getenv(
+    "STUDY_BUDDY_BANK_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 "question_bank.db")
+)
+BANK_SIMILARITY = float(os.getenv("STUDY_BUDDY_BANK_SIMILARITY", "0.7"))
+
+question_bank = None
+if BANK_DB:
+    try:
+        question_bank = QuestionBank(BANK_DB, similarity=BANK_SIMILARITY)
+    except sqlite3.Error as e:
+        print(f"Question bank warning: disabled - {e}")
+
+SHARED_SINGLEFLIGHT = os.getenv("STUDY_BUDDY_SHARED_SINGLEFLIGHT") == "1"
+
+# Longest one upstream call can take: every connect attempt times out and
+# backs off, then the last one reads until the read timeout
+UPSTREAM_DEADLINE = ((MAX_RETRIES + 1) * CONNECT_TIMEOUT + READ_TIMEOUT
+                     + MAX_RETRIES * MAX_RETRY_AFTER)
+
+coalescer = SingleFlight(
+    lock_db=(CACHE_DB or None) if SHARED_SINGLEFLIGHT else None,
+    lease_seconds=UPSTREAM_DEADLINE
+)
+
+
+UPSTREAM_LATENCY = metrics.Histogram(
+    "study_buddy_upstream_request_seconds",
+    "OpenRouter chat completion latency, including retries",
+    ["model", "status"]
+)
+UPSTREAM_RESPONSES = metrics.Counter(
+    "study_buddy_upstream_responses_total",
+    "OpenRouter calls by final HTTP status (error = no response)",
+    ["model", "status"]
+)
+UPSTREAM_TOKENS = metrics.Counter(
+    "study_buddy_upstream_tokens_total",
+    "Tokens reported in OpenRouter usage",
+    ["model", "kind"]
+)
+UPSTREAM_IN_FLIGHT = metrics.Gauge(
+    "study_buddy_upstream_in_flight",
+    "OpenRouter calls currently in flight"
+)
+HEDGED_REQUESTS = metrics.Counter(
+    "study_buddy_hedged_requests_total",
+    "Extra attempts started on a fallback model, by reason",
+    ["model", "reason"]
+)
+
+latency_tracker = LatencyTracker(
+    percentile=HEDGE_PERCENTILE,
+    default=HEDGE_DEFAULT_DELAY,
+    floor=HEDGE_MIN_DELAY
+)
+
+metrics.add_collector(
+    "study_buddy_cache_requests_total",
+    "Result cache lookups by outcome",
+    "counter", ["result"],
+    lambda: {(result,): result_cache.stats()[result]
+             for result in ("memory_hits", "disk_hits", "misses")}
+)
+metrics.add_collector(
+    "study_buddy_coalesced_calls_total",
+    "Generation calls by single-flight role",
+    "counter", ["role"],
+    lambda: {(role,): coalescer.stats()[role]
+             for role in ("leaders", "coalesced", "remote_coalesced")}
+)
+metrics.add_collector(
+    "study_buddy_bank_questions_total",
+    "Questions served from or added to the question bank",
+    "counter", ["action"],
+    lambda: {(action,): count for action, count in bank_stats().items()}
+)
+
+
+@contextmanager
+def _track_upstream(model):
+    """Record latency, status, token usage and in-flight count of one call.
+
+    The caller fills in ``call["status"]`` and ``call["usage"]``.
+    """
+    call = {"status": "error", "usage": None}
+    started = time.perf_counter()
+    UPSTREAM_IN_FLIGHT.inc()
+    try:
+        yield call
+    finally:
+        UPSTREAM_IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - started
+        status = str(call["status"])
+        if status == "200":
+            latency_tracker.record(model, elapsed)
+        elif status == "cancelled":
+            # A hedged attempt that lost the race
+            latency_tracker.record_censored(model, elapsed)
+        UPSTREAM_LATENCY.observe(elapsed, model=model, status=status)
+        UPSTREAM_RESPONSES.inc(model=model, status=status)
+        usage = call["usage"] or {}
+        for kind in ("prompt", "completion"):
+            if usage.get(f"{kind}_tokens"):
+                UPSTREAM_TOKENS.inc(usage[f"{kind}_tokens"], model=model,
+                                    kind=kind)
+
+
+class _BoundedRetry(Retry):
+    """Retry that honors Retry-After but never sleeps longer than the cap"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+def _build_adapter():
+    # read=0: a POST that timed out or broke while reading may already be
+    # generating (and billed) upstream, so only connection failures and
+    # retryable statuses are re-sent
+    retry = _BoundedRetry(
+        total=MAX_RETRIES,
+        read=0,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    return HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=POOL_SIZE,
+        max_retries=retry
+    )
+
+
+_adapter = None
+_adapter_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_session():
+    """Return this thread's session; all threads share one keep-alive pool.
+
+    ``requests.Session`` keeps per-instance cookie state that is not safe to
+    mutate from several threads, so each thread gets its own session while
+    the mounted adapter (and its connection pool) is shared process-wide.
+    """
+    global _adapter
+    session = getattr(_local, "session", None)
+    if session is None:
+        with _adapter_lock:
+            if _adapter is None:
+                _adapter = _build_adapter()
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        session.mount("https://", _adapter)
+        session.mount("http://", _adapter)
+        _local.session = session
+    return session
+
+
+_async_client = None
+_async_semaphore = None
+
+
+def _get_async_client():
+    """Return the shared async client and the global concurrency semaphore.
+
+    Both are bound to the event loop that first uses them, which is the
+    server's single loop when running under ``asgi.py``.
+    """
+    global _async_client, _async_semaphore
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENCY,
+                max_keepalive_connections=POOL_SIZE
+            )
+        )
+        _async_semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _async_client, _async_semaphore
+
+
+async def close_async_client():
+    global _async_client, _async_semaphore
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_semaphore = None
+
+
+def _retry_delay(attempt, response=None):
+    """Seconds to wait before retry number ``attempt`` (0-based)"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after)
+                    delay = when.timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0), MAX_RETRY_AFTER)
+    return min(RETRY_BACKOFF * (2 ** attempt), MAX_RETRY_AFTER)
+
+
+def is_error(result):
+    """Return True if a generation result is an error message"""
+    return isinstance(result, str) and result.startswith("Error:")
+
+
+_chunk_pool = ThreadPoolExecutor(max_workers=CHUNK_WORKERS,
+                                 thread_name_prefix="chunk")
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS,
+                                 thread_name_prefix="hedge")
+
+
+def split_count(num_questions, chunk_size):
+    """Split a question count into near-equal chunks of at most chunk_size"""
+    if not chunk_size or num_questions <= chunk_size:
+        return [num_questions]
+    parts = -(-num_questions // chunk_size)
+    base, extra = divmod(num_questions, parts)
+    return [base + 1 if i < extra else base for i in range(parts)]
+
+
+def _merge(parts, num_questions):
+    # Near-duplicates are judged by the question bank's word-overlap test
+    similar = question_bank.similar if question_bank is not None else None
+    return merge_questions(parts, limit=num_questions, similar=similar)
+
+
+def _merge_chunks(results, num_questions):
+    for result in results:
+        if is_error(result):
+            return result
+    return _merge(results, num_questions)
+
+
+def _top_up_part(parts, attempt):
+    # Numbered past the real part count, which _build_payload words as an
+    # extra set rather than one more slice of the split
+    return parts + attempt + 1, parts
+
+
+def _is_complete(result, num_questions):
+    """True for a full question set, the only kind worth caching"""
+    return not is_error(result) and len(result) >= num_questions
+
+
+def cache_stats():
+    """Hit/miss counters for the question cache in this process"""
+    return result_cache.stats()
+
+
+def coalescing_stats():
+    """How many calls led an upstream request vs. waited on another one"""
+    return coalescer.stats()
+
+
+def model_stats():
+    """Recent latency percentiles and hedge delay per model"""
+    return latency_tracker.stats()
+
+
+def bank_stats():
+    """Questions served from, and added to, the local question bank"""
+    return question_bank.stats() if question_bank else {}
+
+
+def _bank_find(topic, difficulty, num_questions, fresh):
+    if question_bank is None or fresh:
+        return []
+    return question_bank.find(topic, difficulty, num_questions)
+
+
+def _bank_fill(topic, difficulty, banked, result):
+    """Store the newly generated records of a banked + new result"""
+    if is_error(result) or question_bank is None:
+        return result
+    question_bank.add(topic, difficulty,
+                      [record for record in result if record not in banked])
+    return result
+
+
+def _request_split(topic, difficulty, num_questions, chunk_size, banked=()):
+    # Returns the banked records topped up to num_questions with new ones
+    shortfall = num_questions - len(banked)
+    sizes = split_count(shortfall,
+                        CHUNK_SIZE if chunk_size is None else chunk_size)
+    if len(sizes) == 1:
+        results = [_request_questions(topic, difficulty, shortfall)]
+    else:
+        futures = [
+            _chunk_pool.submit(_request_questions, topic, difficulty, size,
+                               (part, len(sizes)))
+            for part, size in enumerate(sizes, start=1)
+        ]
+        results = [f.result() for f in futures]
+    merged = _merge_chunks([list(banked)] + results, num_questions)
+
+    for attempt in range(TOP_UP_ROUNDS):
+        if _is_complete(merged, num_questions) or is_error(merged):
+            break
+        extra = _request_questions(topic, difficulty,
+                                   num_questions - len(merged),
+                                   _top_up_part(len(sizes), attempt))
+        if is_error(extra):
+            break
+        merged = _merge([merged, extra], num_questions)
+    return merged
+
+
+async def _request_split_async(topic, difficulty, num_questions, chunk_size,
+                               banked=()):
+    shortfall = num_questions - len(banked)
+    sizes = split_count(shortfall,
+                        CHUNK_SIZE if chunk_size is None else chunk_size)
+    if len(sizes) == 1:
+        results = [await _request_questions_async(topic, difficulty,
+                                                  shortfall)]
+    else:
+        results = await asyncio.gather(*[
+            _request_questions_async(topic, difficulty, size,
+                                     (part, len(sizes)))
+            for part, size in enumerate(sizes, start=1)
+        ])
+    merged = _merge_chunks([list(banked)] + list(results), num_questions)
+
+    for attempt in range(TOP_UP_ROUNDS):
+        if _is_complete(merged, num_questions) or is_error(merged):
+            break
+        extra = await _request_questions_async(
+            topic, difficulty, num_questions - len(merged),
+            _top_up_part(len(sizes), attempt))
+        if is_error(extra):
+            break
+        merged = _merge([merged, extra], num_questions)
+    return merged
+
+
+def _stream_part(topic, difficulty, num_questions, part=None):
+    # Streaming keeps the "Q1:/A1:" text format, which can be parsed a line
+    # at a time; partial JSON cannot
+    parser = QAStreamParser()
+    payload = _build_payload(topic, difficulty, num_questions, part,
+                             structured=False)
+    for delta in _stream_completion(payload):
+        if is_error(delta):
+            yield delta
+            return
+        yield from parser.feed(delta)
+    yield from parser.finish()
+
+
+def _interleave(streams):
+    """Run generators on the chunk pool, yielding items as any produces them"""
+    items = queue.Queue()
+    stop = threading.Event()
+
+    def pump(stream):
+        try:
+            for item in stream:
+                items.put(item)
+                if stop.is_set():
+                    break
+        except Exception as e:
+            items.put(f"Error: Unexpected failure - {str(e)}")
+        finally:
+            items.put(None)
+
+    for stream in streams:
+        _chunk_pool.submit(pump, stream)
+    try:
+        running = len(streams)
+        while running:
+            item = items.get()
+            if item is None:
+                running -= 1
+            else:
+                yield item
+    finally:
+        stop.set()
+
+
+def _stream_split(topic, difficulty, num_questions, chunk_size, banked=()):
+    """Streaming counterpart of _request_split.
+
+    The banked records are yielded first. New records from the parallel
+    parts follow as soon as any part completes one, skipping repeats, and
+    the shortfall is topped up at the end. An error is yielded last if the
+    set is still incomplete.
+    """
+    kept = _merge([banked], num_questions)
+    yield from kept
+    if len(kept) >= num_questions:
+        return
+
+    sizes = split_count(num_questions - len(kept),
+                        CHUNK_SIZE if chunk_size is None else chunk_size)
+    if len(sizes) == 1:
+        source = _stream_part(topic, difficulty, sizes[0])
+    else:
+        source = _interleave([
+            _stream_part(topic, difficulty, size, (part, len(sizes)))
+            for part, size in enumerate(sizes, start=1)
+        ])
+
+    error = None
+    attempt = 0
+    while True:
+        for item in source:
+            if is_error(item):
+                error = error or item
+                continue
+            merged = _merge([kept, [item]], num_questions)
+            if len(merged) > len(kept):
+                kept = merged
+                yield item
+        if len(kept) >= num_questions or error or attempt >= TOP_UP_ROUNDS:
+            break
+        source = _stream_part(topic, difficulty, num_questions - len(kept),
+                              _top_up_part(len(sizes), attempt))
+        attempt += 1
+    if error and len(kept) < num_questions:
+        yield error
+
+
+def generate_study_questions(topic, difficulty, num_questions=5, fresh=False,
+                             chunk_size=None):
+    """Generate study questions, serving repeats from the result cache.
+
+    Returns a list of ``{"question", "answer"}`` records, or an
+    ``"Error: ..."`` string on failure.
+
+    Pass ``fresh=True`` to skip the cache lookup; the new result still
+    replaces the cached one. Errors are never cached. Concurrent callers
+    with the same key share one upstream request. Matching questions in
+    the local question bank are used first; only the shortfall is
+    requested. Counts above ``chunk_size`` (default STUDY_BUDDY_CHUNK_SIZE,
+    0 disables) are split into parallel requests and merged; questions
+    lost to de-duplication are requested again, and a set that is still
+    short is not cached.
+    """
 
     if not API_KEY:
         return "Error: API key not configured."
@@ -25,39 +538,393 @@ def generate_study_questions(topic, difficulty, num_questions=5):
     if difficulty not in ["easy", "medium", "hard"]:
         return "Error: Invalid difficulty value."
 
+    key = make_cache_key(topic, difficulty, num_questions)
+    if not fresh:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    def request():
+        banked = _bank_find(topic, difficulty, num_questions, fresh)
+        result = banked
+        if len(banked) < num_questions:
+            result = _request_split(topic, difficulty, num_questions,
+                                    chunk_size, banked)
+            _bank_fill(topic, difficulty, banked, result)
+        if _is_complete(result, num_questions):
+            result_cache.set(key, result)
+        return result
+
+    # A fresh caller must not be handed the stale entry it asked to skip
+    lookup = None if fresh else lambda: result_cache.get(key, record=False)
+    return coalescer.do(key, request, lookup=lookup)
+
+
+async def generate_study_questions_async(topic, difficulty, num_questions=5,
+                                        fresh=False, chunk_size=None):
+    """Async variant of generate_study_questions for the ASGI entry point.
+
+    Upstream calls share one httpx client and are capped process-wide by
+    STUDY_BUDDY_MAX_CONCURRENCY.
+    """
+
+    if not API_KEY:
+        return "Error: API key not configured."
+
+    if difficulty not in ["easy", "medium", "hard"]:
+        return "Error: Invalid difficulty value."
+
+    key = make_cache_key(topic, difficulty, num_questions)
+    if not fresh:
+        cached = await asyncio.to_thread(result_cache.get, key)
+        if cached is not None:
+            return cached
+
+    async def request():
+        banked = await asyncio.to_thread(_bank_find, topic, difficulty,
+                                         num_questions, fresh)
+        result = banked
+        if len(banked) < num_questions:
+            result = await _request_split_async(topic, difficulty,
+                                                num_questions, chunk_size,
+                                                banked)
+            await asyncio.to_thread(_bank_fill, topic, difficulty, banked,
+                                    result)
+        if _is_complete(result, num_questions):
+            await asyncio.to_thread(result_cache.set, key, result)
+        return result
+
+    return await coalescer.do_async(key, request)
+
+
+def iter_batch(items, max_workers=BATCH_WORKERS, rate=BATCH_RATE):
+    """Generate questions for many items, yielding results in input order.
+
+    Each item is a dict of generate_study_questions arguments. Items that
+    are already ``"Error: ..."`` strings (e.g. failed validation) are passed
+    through in place. At most ``2 * max_workers`` items are in flight, and
+    upstream calls (cache misses) are limited to ``rate`` per second.
+    """
+    limiter = RateLimiter(rate) if rate else None
+
+    def run(item):
+        if is_error(item):
+            return item
+        try:
+            key = make_cache_key(item["topic"], item["difficulty"],
+                                 item.get("num_questions", 5))
+            if limiter and (item.get("fresh")
+                            or result_cache.get(key, record=False) is None):
+                limiter.acquire()
+            return generate_study_questions(**item)
+        except Exception as e:
+            return f"Error: Unexpected failure - {str(e)}"
+
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            for item in items:
+                pending.append(pool.submit(run, item))
+                if len(pending) >= 2 * max_workers:
+                    break
+            while pending:
+                result = pending.popleft().result()
+                item = next(items, None)
+                if item is not None:
+                    pending.append(pool.submit(run, item))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def generate_batch(items, max_workers=BATCH_WORKERS, rate=BATCH_RATE):
+    """Generate questions for many items and return the results in order"""
+    return list(iter_batch(items, max_workers=max_workers, rate=rate))
+
+
+def stream_study_questions(topic, difficulty, num_questions=5, fresh=False,
+                           chunk_size=None):
+    """Yield question/answer pairs as soon as each one is complete.
+
+    Sends ``"stream": true`` to OpenRouter and parses the SSE deltas as they
+    arrive. A cached result is replayed immediately. Like
+    generate_study_questions, matching questions from the question bank
+    come first and only the shortfall is requested, split into parallel
+    streams for large counts. On failure an
+    ``"Error: ..."`` string is yielded as the last item.
+    """
+
+    if not API_KEY:
+        yield "Error: API key not configured."
+        return
+
+    if difficulty not in ["easy", "medium", "hard"]:
+        yield "Error: Invalid difficulty value."
+        return
+
+    key = make_cache_key(topic, difficulty, num_questions)
+    if not fresh:
+        cached = result_cache.get(key)
+        if cached is not None:
+            yield from cached
+            return
+
+    def produce():
+        banked = _bank_find(topic, difficulty, num_questions, fresh)
+        records = []
+        for item in _stream_split(topic, difficulty, num_questions,
+                                  chunk_size, banked):
+            if is_error(item):
+                yield item
+                return
+            records.append(item)
+            yield item
+
+        if _is_complete(records, num_questions):
+            result_cache.set(key, records)
+        _bank_fill(topic, difficulty, banked, records)
+
+    # Identical streams share one upstream call: later callers replay what
+    # the first has received so far, then follow it live
+    lookup = None if fresh else lambda: result_cache.get(key, record=False)
+    yield from coalescer.stream(key, produce, lookup)
+
+
+def _build_payload(topic, difficulty, num_questions, part=None,
+                   structured=True):
+    # Chunked requests ask each part for a different slice of the topic so
+    # the merged set has fewer duplicates to drop
+    focus = ""
+    if part and part[0] > part[1]:
+        # A top-up for questions lost to de-duplication
+        earlier = ("an earlier request" if part[1] == 1
+                   else f"{part[1]} earlier requests")
+        focus = (f"This is extra set {part[0] - part[1]}: {earlier} on this "
+                 f"topic came up short. Ask about subtopics they are "
+                 f"unlikely to have covered, so no question repeats them.\n")
+    elif part:
+        focus = (f"This is part {part[0]} of {part[1]} of a larger set. "
+                 f"Move from fundamentals in part 1 toward more specific "
+                 f"subtopics in later parts, so the parts do not overlap.\n")
+
+    if structured:
+        output_format = """Respond with JSON only, in this shape:
+{"questions": [{"question": "[Question here]", "answer": "[Answer here]"}]}"""
+    else:
+        output_format = """Format each question like this:
+Q1: [Question here]
+A1: [Answer here]"""
+
     prompt = f"""
 Generate {num_questions} practice questions about {topic}.
 Difficulty level: {difficulty}.
-
-Format each question like this:
-Q1: [Question here]
-A1: [Answer here]
+{focus}
+{output_format}
 
 Make questions clear and educational.
 """
 
     payload = {
-        "model": "openai/gpt-4o-mini",
+        "model": MODELS[0],
         "messages": [
             {"role": "system", "content": "You are a helpful study assistant."},
             {"role": "user", "content": prompt}
         ],
         "temperature": 0.7
     }
+    if structured:
+        payload["response_format"] = {"type": "json_object"}
+    return payload
 
+
+def _parse_content(content):
+    records = parse_response(content)
+    if not records:
+        return "Error: The AI response did not contain any questions."
+    return records
+
+
+def _count_hedge(model, reason):
+    HEDGED_REQUESTS.inc(model=model, reason=reason)
+
+
+def _request_questions(topic, difficulty, num_questions, part=None):
+    """Generate study questions using OpenRouter API.
+
+    With several STUDY_BUDDY_MODELS configured, a fallback model is raced
+    against the primary once it runs past its recent p90 latency (or
+    fails), and the first complete answer wins.
+    """
+
+    payload = _build_payload(topic, difficulty, num_questions, part)
+    if len(MODELS) == 1:
+        return _complete(payload)
+
+    return hedged_call(
+        MODELS,
+        lambda model, cancel: _complete_cancellable({**payload,
+                                                     "model": model}, cancel),
+        latency_tracker, _hedge_pool, is_error, on_hedge=_count_hedge
+    )
+
+
+async def _request_questions_async(topic, difficulty, num_questions,
+                                   part=None):
+    """Generate study questions using OpenRouter API without blocking"""
+
+    payload = _build_payload(topic, difficulty, num_questions, part)
+    if len(MODELS) == 1:
+        return await _complete_async(payload)
+
+    return await hedged_call_async(
+        MODELS,
+        lambda model: _complete_async({**payload, "model": model}),
+        latency_tracker, is_error, on_hedge=_count_hedge
+    )
+
+
+def _complete(payload):
     try:
-        response = requests.post(
-            BASE_URL,
-            headers=HEADERS,
-            json=payload,
-            timeout=30
-        )
-        response.raise_for_status()
+        with _track_upstream(payload["model"]) as call:
+            response = get_session().post(
+                BASE_URL,
+                json=payload,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+            )
+            call["status"] = response.status_code
+            response.raise_for_status()
 
-        resp_json = response.json()
-        return resp_json["choices"][0]["message"]["content"]
+            resp_json = response.json()
+            call["usage"] = resp_json.get("usage")
+        return _parse_content(resp_json["choices"][0]["message"]["content"])
 
     except RequestException as e:
         return f"Error: API request failed - {str(e)}"
     except Exception as e:
         return f"Error: Unexpected failure - {str(e)}"
+
+
+def _complete_cancellable(payload, cancel):
+    """Like _complete, but streamed so the call can be dropped mid-way.
+
+    Setting ``cancel`` closes the response from the cancelling thread,
+    which releases the connection and stops the upstream generation
+    instead of waiting for the next line to arrive.
+    """
+    chunks = []
+    for delta in _stream_completion(payload, cancel):
+        if is_error(delta):
+            return delta
+        chunks.append(delta)
+    if cancel.is_set():
+        return "Error: Request cancelled."
+    return _parse_content("".join(chunks))
+
+
+async def _complete_async(payload):
+    client, semaphore = _get_async_client()
+
+    try:
+        async with semaphore:
+            with _track_upstream(payload["model"]) as call:
+                try:
+                    for attempt in range(MAX_RETRIES + 1):
+                        try:
+                            response = await client.post(BASE_URL,
+                                                         json=payload)
+                        except (httpx.ConnectError, httpx.ConnectTimeout):
+                            # Never sent; read failures are not retried,
+                            # see _build_adapter
+                            if attempt == MAX_RETRIES:
+                                raise
+                            await asyncio.sleep(_retry_delay(attempt))
+                            continue
+
+                        call["status"] = response.status_code
+                        if (response.status_code in RETRY_STATUSES
+                                and attempt < MAX_RETRIES):
+                            await asyncio.sleep(
+                                _retry_delay(attempt, response)
+                            )
+                            continue
+
+                        response.raise_for_status()
+                        resp_json = response.json()
+                        call["usage"] = resp_json.get("usage")
+                        break
+                except asyncio.CancelledError:
+                    call["status"] = "cancelled"
+                    raise
+        return _parse_content(resp_json["choices"][0]["message"]["content"])
+
+    except httpx.HTTPError as e:
+        return f"Error: API request failed - {str(e)}"
+    except Exception as e:
+        return f"Error: Unexpected failure - {str(e)}"
+
+
+def _abort(response):
+    """Close a streamed response from another thread.
+
+    close() alone leaves a thread blocked in recv() waiting for the next
+    line; shutting the socket down wakes it at once.
+    """
+    connection = getattr(response.raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+def _stream_completion(payload, cancel=None):
+    """Yield content deltas from a streaming chat completion"""
+
+    try:
+        with _track_upstream(payload["model"]) as call, get_session().post(
+            BASE_URL,
+            json={**payload, "stream": True, "usage": {"include": True}},
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            stream=True
+        ) as response:
+            call["status"] = response.status_code
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            if cancel is not None:
+                cancel.add_callback(lambda: _abort(response))
+
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if cancel is not None and cancel.is_set():
+                        call["status"] = "cancelled"
+                        return
+                    # Blank lines separate events; ":" lines are keep-alives
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    event = json.loads(data)
+                    if "error" in event:
+                        yield f"Error: API request failed - {event['error']}"
+                        return
+                    if event.get("usage"):
+                        call["usage"] = event["usage"]
+                    choices = event.get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+            except Exception:
+                if cancel is not None and cancel.is_set():
+                    call["status"] = "cancelled"
+                    return
+                raise
+
+    except RequestException as e:
+        yield f"Error: API request failed - {str(e)}"
+    except Exception as e:
+        yield f"Error: Unexpected failure - {str(e)}"
@@ -1,13 +1,206 @@
+import json
 import os
-from flask import Flask, render_template, request
-from ai_helper import generate_study_questions
+import sqlite3
+import time
+from flask import (Flask, Response, g, jsonify, redirect, render_template,
+                   request, stream_with_context, url_for)
+import delivery
+import metrics
+from admission import AdmissionControl
+from cache import make_cache_key
+from jobs import JobQueue, QueueFull
+from ai_helper import (bank_stats, cache_stats, coalescing_stats,
+                       generate_study_questions, is_error, iter_batch,
+                       model_stats, stream_study_questions)
 
 app = Flask(__name__)
+delivery.init_app(app)
+
+MAX_QUESTIONS = int(os.getenv("STUDY_BUDDY_MAX_QUESTIONS", "100"))
+BATCH_MAX_ITEMS = int(os.getenv("STUDY_BUDDY_BATCH_MAX_ITEMS", "200"))
+
+JOBS_DB = os.getenv(
+    "STUDY_BUDDY_JOBS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.db")
+)
+JOB_WORKERS = int(os.getenv("STUDY_BUDDY_JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("STUDY_BUDDY_JOB_QUEUE_SIZE", "100"))
+JOB_TTL = int(os.getenv("STUDY_BUDDY_JOB_TTL", "3600"))
+
+ADMISSION_DB = os.getenv(
+    "STUDY_BUDDY_ADMISSION_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "admission.db")
+)
+# The in-flight cap below is the main guard. The per-client bucket keeps
+# one client (or one NAT address) to half of its slots in a burst, then a
+# couple of new requests a second
+CLIENT_RATE = float(os.getenv("STUDY_BUDDY_CLIENT_RATE", "2"))
+CLIENT_BURST = float(os.getenv("STUDY_BUDDY_CLIENT_BURST", "16"))
+MAX_IN_FLIGHT = int(os.getenv("STUDY_BUDDY_MAX_IN_FLIGHT", "32"))
+MAX_WAITING = int(os.getenv("STUDY_BUDDY_MAX_WAITING", "64"))
+MAX_WAIT = float(os.getenv("STUDY_BUDDY_MAX_WAIT", "2"))
+TRUST_PROXY = os.getenv("STUDY_BUDDY_TRUST_PROXY") == "1"
+BUSY_MESSAGE = "The server is busy. Please try again shortly."
+
+# Endpoints that can reach OpenRouter go through admission control
+ADMITTED_ENDPOINTS = {"generate", "generate_stream", "questions_api",
+                      "generate_batch_api", "submit_job"}
+
+admission = None
+if ADMISSION_DB:
+    try:
+        admission = AdmissionControl(
+            ADMISSION_DB,
+            rate=CLIENT_RATE,
+            burst=CLIENT_BURST,
+            max_in_flight=MAX_IN_FLIGHT,
+            max_waiting=MAX_WAITING,
+            max_wait=MAX_WAIT
+        )
+    except sqlite3.Error as e:
+        print(f"Admission warning: disabled - {e}")
+
+job_queue = JobQueue(
+    JOBS_DB,
+    run=lambda params: generate_study_questions(**params),
+    is_error=is_error,
+    workers=JOB_WORKERS,
+    max_queued=JOB_QUEUE_SIZE,
+    ttl=JOB_TTL
+)
+
+REQUEST_LATENCY = metrics.Histogram(
+    "study_buddy_http_request_seconds",
+    "Time to produce response headers, by route",
+    ["route", "method", "status"]
+)
+REQUESTS_IN_FLIGHT = metrics.Gauge(
+    "study_buddy_http_requests_in_flight",
+    "HTTP requests currently being handled"
+)
+metrics.add_collector(
+    "study_buddy_admission_decisions_total",
+    "Requests to generation endpoints by admission decision",
+    "counter", ["decision"],
+    lambda: {(decision,): admission.stats()[decision]
+             for decision in ("admitted", "rate_limited", "overloaded")
+             if admission}
+)
+metrics.add_collector(
+    "study_buddy_jobs",
+    "Stored generation jobs by status",
+    "gauge", ["status"],
+    lambda: {(status,): count for status, count in job_queue.stats().items()}
+)
 
 if not os.getenv("OPENROUTER_API_KEY"):
     print("WARNING: OPENROUTER_API_KEY is not set.")
 
 
+def read_generate_params(source):
+    """Validate topic/count/difficulty from a form or query string.
+
+    Returns ``(params, None)`` on success or ``(None, message)``.
+    """
+    topic = source.get("topic", "").strip()
+    if not topic:
+        return None, "Please enter a topic."
+
+    try:
+        num_questions = int(source.get("num_questions"))
+        if not 1 <= num_questions <= MAX_QUESTIONS:
+            raise ValueError
+    except (ValueError, TypeError):
+        return None, "Invalid number of questions."
+
+    difficulty = source.get("difficulty")
+    if difficulty not in ["easy", "medium", "hard"]:
+        return None, "Invalid difficulty selected."
+
+    return {
+        "topic": topic,
+        "difficulty": difficulty,
+        "num_questions": num_questions,
+        "fresh": source.get("fresh") == "1"
+    }, None
+
+
+def client_id(remote_addr, forwarded_for=None):
+    """Rate-limit key for a client; X-Forwarded-For only behind a proxy"""
+    if TRUST_PROXY and forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    return remote_addr or "unknown"
+
+
+def too_many_requests(retry_after, html=False, stream=False):
+    headers = {"Retry-After": str(retry_after)}
+    if stream:
+        # EventSource only reads events from a 200 response; a 429 would
+        # reach the page as a bare "connection lost"
+        return Response(
+            sse_event("error", {"message": BUSY_MESSAGE,
+                                "retry_after": retry_after}),
+            mimetype="text/event-stream",
+            headers={**headers, "Cache-Control": "no-cache"}
+        )
+    if html:
+        return render_template("error.html", message=BUSY_MESSAGE), 429, headers
+    return jsonify({"error": BUSY_MESSAGE}), 429, headers
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+@app.before_request
+def admit_request():
+    if admission is None or request.endpoint not in ADMITTED_ENDPOINTS:
+        return None
+    ticket, retry_after = admission.admit(
+        client_id(request.remote_addr,
+                  request.headers.get("X-Forwarded-For"))
+    )
+    if ticket is None:
+        html = (request.endpoint in ("generate", "submit_job")
+                and not request.is_json)
+        return too_many_requests(
+            retry_after, html=html,
+            stream=request.endpoint == "generate_stream"
+        )
+    # Released in teardown, which for streamed responses runs only once
+    # the stream has finished
+    g.admission_ticket = ticket
+    return None
+
+
+@app.after_request
+def record_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        REQUESTS_IN_FLIGHT.dec()
+        rule = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe(time.perf_counter() - started, route=rule,
+                                method=request.method,
+                                status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def release_in_flight(error=None):
+    # after_request is skipped when a view raises; balance the gauge here
+    if g.pop("request_started", None) is not None:
+        REQUESTS_IN_FLIGHT.dec()
+    ticket = g.pop("admission_ticket", None)
+    if ticket is not None:
+        admission.release(ticket)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.route("/")
 def home():
     return render_template("index.html")
@@ -16,37 +209,19 @@ def home():
 @app.route("/generate", methods=["POST"])
 def generate():
     try:
-        topic = request.form.get("topic", "").strip()
-        if not topic:
-            return render_template("error.html",
-                                   message="Please enter a topic.")
-
-        try:
-            num_questions = int(request.form.get("num_questions"))
-            if not 1 <= num_questions <= 20:
-                raise ValueError
-        except (ValueError, TypeError):
-            return render_template("error.html",
-                                   message="Invalid number of questions.")
+        params, message = read_generate_params(request.form)
+        if message:
+            return render_template("error.html", message=message)
 
-        difficulty = request.form.get("difficulty")
-        if difficulty not in ["easy", "medium", "hard"]:
-            return render_template("error.html",
-                                   message="Invalid difficulty selected.")
-
-        questions = generate_study_questions(
-            topic=topic,
-            difficulty=difficulty,
-            num_questions=num_questions
-        )
+        questions = generate_study_questions(**params)
 
-        if questions.startswith("Error:"):
+        if is_error(questions):
             return render_template("error.html",
                                    message=questions)
 
         return render_template(
             "results.html",
-            topic=topic,
+            topic=params["topic"],
             questions=questions
         )
 
@@ -58,5 +233,240 @@ def generate():
         )
 
 
+@app.route("/generate/live")
+def generate_live():
+    params, message = read_generate_params(request.args)
+    if message:
+        return render_template("error.html", message=message)
+
+    return render_template("stream.html", topic=params["topic"])
+
+
+@app.route("/generate/stream")
+def generate_stream():
+    params, message = read_generate_params(request.args)
+
+    def events():
+        if message:
+            yield sse_event("error", {"message": message})
+            return
+        try:
+            number = 0
+            for item in stream_study_questions(**params):
+                if is_error(item):
+                    yield sse_event("error", {"message": item})
+                    return
+                number += 1
+                yield sse_event("question", {"number": number, **item})
+            yield sse_event("done", {"count": number})
+        except Exception as e:
+            print(f"Server Error: {e}")
+            yield sse_event("error", {
+                "message": "Something went wrong. Please try again."
+            })
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def job_response(job):
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "topic": job["params"]["topic"],
+        "questions": job["result"],
+        "error": job["error"],
+        "created": job["created"],
+        "updated": job["updated"]
+    }
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a generation job and return its ID straight away.
+
+    Accepts the same fields as /generate as a form or JSON object. Form
+    posts are redirected to a page that polls the job; API clients get
+    202 with ``job_id`` and ``status_url``.
+    """
+    body = request.get_json(silent=True)
+    is_form = not isinstance(body, dict)
+    if is_form:
+        source = request.form
+    else:
+        source = {
+            "topic": str(body.get("topic", "")),
+            "difficulty": body.get("difficulty", "medium"),
+            "num_questions": body.get("num_questions", 5),
+            "fresh": "1" if body.get("fresh") else ""
+        }
+
+    params, message = read_generate_params(source)
+    if message:
+        if is_form:
+            return render_template("error.html", message=message), 400
+        return jsonify({"error": message}), 400
+
+    key = make_cache_key(params["topic"], params["difficulty"],
+                         params["num_questions"])
+    if params["fresh"]:
+        key += "|fresh"
+    try:
+        job_id, created = job_queue.submit(key, params)
+    except QueueFull:
+        retry = {"Retry-After": "5"}
+        if is_form:
+            html = render_template("error.html", message=BUSY_MESSAGE)
+            return html, 503, retry
+        return jsonify({"error": "Job queue is full."}), 503, retry
+
+    if is_form:
+        return redirect(url_for("job_page", job_id=job_id), code=303)
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("job_status", job_id=job_id),
+        "deduplicated": not created
+    }), 202, {"Location": url_for("job_status", job_id=job_id)}
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+    return jsonify(job_response(job))
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+    cancelled = job_queue.cancel(job_id)
+    status = 200 if cancelled else 409
+    return jsonify(job_response(job_queue.get(job_id))), status
+
+
+@app.route("/jobs/<job_id>/view")
+def job_page(job_id):
+    """Results once the job has finished, otherwise a page that polls it"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return render_template("error.html",
+                               message="This job has expired."), 404
+    if job["status"] == "done":
+        return render_template("results.html",
+                               topic=job["params"]["topic"],
+                               questions=job["result"])
+    if job["status"] in ("failed", "cancelled", "expired"):
+        return render_template(
+            "error.html",
+            message=job["error"] or f"This job was {job['status']}."
+        )
+    return render_template("job.html", job_id=job_id,
+                           topic=job["params"]["topic"])
+
+
+@app.route("/api/questions")
+def questions_api():
+    """Question/answer records as JSON, paginated with page/per_page"""
+    params, message = read_generate_params(request.args)
+    if message:
+        return jsonify({"error": message}), 400
+
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = min(100, max(1, int(request.args.get("per_page", 20))))
+    except ValueError:
+        return jsonify({"error": "Invalid page or per_page."}), 400
+
+    questions = generate_study_questions(**params)
+    if is_error(questions):
+        return jsonify({"error": questions}), 502
+
+    start = (page - 1) * per_page
+    return jsonify({
+        "topic": params["topic"],
+        "difficulty": params["difficulty"],
+        "total": len(questions),
+        "page": page,
+        "per_page": per_page,
+        "questions": questions[start:start + per_page]
+    })
+
+
+@app.route("/api/generate_batch", methods=["POST"])
+def generate_batch_api():
+    """Generate questions for a JSON list of {topic, difficulty, num_questions}.
+
+    Returns ``{"results": [...]}`` in input order, or one JSON object per
+    line (NDJSON) as each result is ready when ``?stream=1`` is given or
+    the client accepts ``application/x-ndjson``.
+    """
+    body = request.get_json(silent=True)
+    items = body.get("items") if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of items."}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({
+            "error": f"At most {BATCH_MAX_ITEMS} items per batch."
+        }), 400
+
+    jobs = []
+    for item in items:
+        if not isinstance(item, dict):
+            jobs.append("Error: Each item must be an object.")
+            continue
+        params, message = read_generate_params({
+            "topic": str(item.get("topic", "")),
+            "difficulty": item.get("difficulty", "medium"),
+            "num_questions": item.get("num_questions", 5),
+            "fresh": "1" if item.get("fresh") else ""
+        })
+        jobs.append(params if params else f"Error: {message}")
+
+    def results():
+        for index, result in enumerate(iter_batch(jobs)):
+            entry = {"index": index}
+            if isinstance(jobs[index], dict):
+                entry["topic"] = jobs[index]["topic"]
+            if is_error(result):
+                entry["error"] = result
+            else:
+                entry["questions"] = result
+            yield entry
+
+    stream = (request.args.get("stream") == "1"
+              or "application/x-ndjson" in request.headers.get("Accept", ""))
+    if stream:
+        return Response(
+            stream_with_context(json.dumps(entry) + "\n"
+                                for entry in results()),
+            mimetype="application/x-ndjson"
+        )
+    return jsonify({"results": list(results())})
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(),
+                    mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/cache/stats")
+def cache_status():
+    return jsonify({
+        **cache_stats(),
+        "coalescing": coalescing_stats(),
+        "bank": bank_stats(),
+        "models": model_stats(),
+        "jobs": job_queue.stats(),
+        "admission": admission.stats() if admission else {}
+    })
+
+
 if __name__ == "__main__":
     app.run(debug=True)
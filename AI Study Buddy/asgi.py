@@ -0,0 +1,136 @@
+"""ASGI entry point: ``uvicorn asgi:application``
+
+``POST /generate`` is served natively on the event loop, so a slow
+completion costs a coroutine rather than a worker thread. Every other route,
+including the ``/generate/stream`` feed the UI uses, is delegated to the
+Flask app on a pool of ``STUDY_BUDDY_WSGI_THREADS`` threads, so a slow
+stream never holds up the other pages.
+"""
+import asyncio
+import os
+import time
+from urllib.parse import parse_qsl
+from a2wsgi import WSGIMiddleware
+from flask import render_template
+import delivery
+from ai_helper import close_async_client, generate_study_questions_async, is_error
+from app import (BUSY_MESSAGE, MAX_IN_FLIGHT, MAX_WAITING, REQUEST_LATENCY,
+                 REQUESTS_IN_FLIGHT, admission, app, client_id,
+                 read_generate_params)
+
+# Enough threads for every admitted and waiting generation request, with
+# some to spare for pages, static files and job polls. asgiref's
+# WsgiToAsgi would run them all on one shared thread.
+WSGI_THREADS = int(os.getenv("STUDY_BUDDY_WSGI_THREADS",
+                             str(MAX_IN_FLIGHT + MAX_WAITING + 16)))
+
+flask_app = WSGIMiddleware(app, workers=WSGI_THREADS)
+
+
+async def read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+def render(scope, template, **context):
+    """Render a Flask template outside of a WSGI request"""
+    headers = dict(scope.get("headers", []))
+    host = headers.get(b"host", b"localhost").decode("latin-1")
+    base_url = f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}"
+    with app.test_request_context(scope["path"], base_url=base_url,
+                                  method=scope["method"]):
+        return render_template(template, **context)
+
+
+async def send_html(scope, send, html, status=200, headers=()):
+    body = html.encode("utf-8")
+    headers = [(b"content-type", b"text/html; charset=utf-8"),
+               (b"vary", b"Accept-Encoding"), *headers]
+    accept = dict(scope.get("headers", [])).get(b"accept-encoding", b"")
+    encoding = delivery.choose_encoding(accept.decode("latin-1"))
+    if encoding and len(body) >= delivery.MIN_COMPRESS_SIZE:
+        body = delivery.compress(body, encoding)
+        headers.append((b"content-encoding", encoding.encode()))
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": headers,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def generate(scope, receive, send):
+    started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    status = 200
+    ticket = None
+    try:
+        if admission is not None:
+            headers = dict(scope.get("headers", []))
+            forwarded = headers.get(b"x-forwarded-for", b"").decode("latin-1")
+            ticket, retry_after = await admission.admit_async(
+                client_id((scope.get("client") or [None])[0], forwarded)
+            )
+            if ticket is None:
+                status = 429
+                html = render(scope, "error.html", message=BUSY_MESSAGE)
+                await send_html(scope, send, html, status,
+                                [(b"retry-after", str(retry_after).encode())])
+                return
+        await _generate(scope, receive, send)
+    finally:
+        if ticket is not None:
+            await asyncio.to_thread(admission.release, ticket)
+        REQUESTS_IN_FLIGHT.dec()
+        REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                route="/generate", method="POST",
+                                status=status)
+
+
+async def _generate(scope, receive, send):
+    body = await read_body(receive)
+    form = dict(parse_qsl(body.decode("utf-8", "replace"),
+                          keep_blank_values=True))
+    try:
+        params, message = read_generate_params(form)
+        if message:
+            html = render(scope, "error.html", message=message)
+        else:
+            questions = await generate_study_questions_async(**params)
+            if is_error(questions):
+                html = render(scope, "error.html", message=questions)
+            else:
+                html = render(scope, "results.html", topic=params["topic"],
+                              questions=questions)
+    except Exception as e:
+        print(f"Server Error: {e}")
+        html = render(scope, "error.html",
+                      message="Something went wrong. Please try again.")
+    await send_html(scope, send, html)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_async_client()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif (scope["type"] == "http" and scope["path"] == "/generate"
+            and scope["method"] == "POST"):
+        await generate(scope, receive, send)
+    else:
+        await flask_app(scope, receive, send)
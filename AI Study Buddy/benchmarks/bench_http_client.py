@@ -0,0 +1,64 @@
+"""Compare per-request latency of one-shot requests.post vs the pooled client.
+
+Runs a local stand-in for the chat-completions endpoint so no API key or
+network access is needed:
+
+    python benchmarks/bench_http_client.py --requests 200
+
+The stand-in speaks plain HTTP, so the saving shown is the TCP connect only;
+against openrouter.ai the TLS handshake makes the gap considerably larger.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+import ai_helper  # noqa: E402
+from mock_openrouter import start_background  # noqa: E402
+
+
+def run(label, send, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        send()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<14} mean {statistics.mean(timings):7.3f} ms"
+          f"   p50 {statistics.median(timings):7.3f} ms   p95 {p95:7.3f} ms")
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server, url = start_background()
+    payload = {"model": "stand-in", "messages": []}
+
+    one_shot = run(
+        "requests.post",
+        lambda: requests.post(url, headers=ai_helper.HEADERS, json=payload,
+                              timeout=30).json(),
+        args.requests
+    )
+    session = ai_helper.get_session()
+    pooled = run(
+        "pooled client",
+        lambda: session.post(url, json=payload,
+                             timeout=(ai_helper.CONNECT_TIMEOUT,
+                                      ai_helper.READ_TIMEOUT)).json(),
+        args.requests
+    )
+    print(f"saved per request: {one_shot - pooled:.3f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
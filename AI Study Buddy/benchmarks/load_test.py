@@ -0,0 +1,173 @@
+"""Drive POST /generate at fixed concurrency levels and record the results.
+
+Start the mock upstream and the app, then run the load test:
+
+    python benchmarks/mock_openrouter.py --latency lognormal:1.5,0.5 &
+    OPENROUTER_BASE_URL=http://127.0.0.1:8999/api/v1/chat/completions \\
+        OPENROUTER_API_KEY=mock python app.py &
+    python benchmarks/load_test.py --concurrency 1,10,50 --requests 200 \\
+        --output results/run1 --baseline results/run0.json
+
+Each level reports throughput, p50/p95/p99 latency and error rate. A
+response with fewer question cards than ``--num-questions`` counts as an
+error, and is also reported as ``short``. Results are written to
+``OUTPUT.json`` and ``OUTPUT.csv``; ``--baseline`` prints the change
+against an earlier JSON artifact.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+FIELDS = ["concurrency", "requests", "errors", "short", "error_rate",
+          "throughput_rps", "mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1,
+                max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def send(url, topic, args):
+    form = {
+        "topic": topic,
+        "difficulty": args.difficulty,
+        "num_questions": str(args.num_questions),
+    }
+    if args.fresh:
+        form["fresh"] = "1"
+    data = urllib.parse.urlencode(form).encode()
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, data=data,
+                                    timeout=args.timeout) as response:
+            body = response.read().decode("utf-8", "replace")
+            if response.status != 200:
+                outcome = "error"
+            elif body.count('class="question-card"') < args.num_questions:
+                outcome = "short"
+            else:
+                outcome = "ok"
+    except (urllib.error.URLError, OSError):
+        outcome = "error"
+    return time.perf_counter() - started, outcome
+
+
+def run_level(url, concurrency, args):
+    topics = [f"{args.topic} {i}" for i in range(args.unique_topics)]
+    latencies = []
+    errors = 0
+    short = 0
+    lock = threading.Lock()
+
+    def worker(_):
+        nonlocal errors, short
+        elapsed, outcome = send(url, random.choice(topics), args)
+        with lock:
+            latencies.append(elapsed)
+            if outcome != "ok":
+                errors += 1
+            if outcome == "short":
+                short += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = 1000
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "short": short,
+        "error_rate": round(errors / len(latencies), 4),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "mean_ms": round(statistics.mean(latencies) * to_ms, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * to_ms, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * to_ms, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * to_ms, 1),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {row["concurrency"]: row for row in json.load(f)["levels"]}
+    print(f"\nChange vs {baseline_path}:")
+    for row in results:
+        old = baseline.get(row["concurrency"])
+        if not old:
+            continue
+        changes = []
+        for field in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms",
+                      "error_rate"):
+            if old[field]:
+                delta = (row[field] - old[field]) / old[field] * 100
+                changes.append(f"{field} {delta:+.1f}%")
+        print(f"  c={row['concurrency']:<4} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000/generate")
+    parser.add_argument("--concurrency", default="1,5,10,25",
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100,
+                        help="requests per concurrency level")
+    parser.add_argument("--topic", default="Photosynthesis")
+    parser.add_argument("--unique-topics", type=int, default=1,
+                        help="spread requests over this many topics")
+    parser.add_argument("--difficulty", default="medium")
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--fresh", action="store_true",
+                        help="bypass the cache on every request")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", default="load_test",
+                        help="artifact path without extension")
+    parser.add_argument("--baseline", help="earlier JSON artifact to compare")
+    args = parser.parse_args()
+
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    results = []
+    for level in [int(c) for c in args.concurrency.split(",")]:
+        row = run_level(args.url, level, args)
+        results.append(row)
+        print(f"c={row['concurrency']:<4} {row['throughput_rps']:>8} rps"
+              f"  p50 {row['p50_ms']:>8} ms  p95 {row['p95_ms']:>8} ms"
+              f"  p99 {row['p99_ms']:>8} ms  errors {row['error_rate']:.2%}"
+              f" ({row['short']} short)")
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{args.output}.json", "w") as f:
+        json.dump({
+            "url": args.url,
+            "started": started,
+            "options": vars(args),
+            "levels": results,
+        }, f, indent=2)
+    with open(f"{args.output}.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Wrote {args.output}.json and {args.output}.csv")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Offline stand-in for the OpenRouter chat-completions endpoint.
+
+    python benchmarks/mock_openrouter.py --port 8999 --latency lognormal:1.5,0.5 --error-rate 0.02
+
+Then point the app at it (any non-empty API key works):
+
+    OPENROUTER_BASE_URL=http://127.0.0.1:8999/api/v1/chat/completions
+    OPENROUTER_API_KEY=mock
+
+Latency specs are ``fixed:SECONDS``, ``uniform:LOW,HIGH`` or
+``lognormal:MEDIAN,SIGMA``. Replies follow the request: the question count
+and chunk part are read from the prompt, ``response_format`` selects JSON
+output and ``"stream": true`` returns SSE deltas spread over the sampled
+latency. With ``--duplicate-rate``, that share of questions repeats one
+that other replies give too, word for word or reworded, so the app's
+de-duplication and top-ups have work to do. Every option can also be set
+through a ``MOCK_OPENROUTER_*`` env var.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_latency(spec):
+    """Return a function that samples a latency in seconds"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def build_reply(prompt, structured, duplicate_rate=0.0):
+    match = re.search(r"Generate (\d+) practice questions about (.+?)\.\n",
+                      prompt)
+    count = int(match.group(1)) if match else 5
+    topic = match.group(2) if match else "the topic"
+    # Each chunk part or extra set ("This is ...") gets its own block of
+    # question numbers, the way a model follows the prompt's focus
+    focus = re.search(r"^This is .*$", prompt, re.MULTILINE)
+    first = 1
+    if focus:
+        first += zlib.crc32(focus.group(0).encode()) % 100000 * 100
+    records = []
+    for n in range(first, first + count):
+        ending = "?"
+        if random.random() < duplicate_rate:
+            # One of the few questions every reply may come back to,
+            # sometimes with a word added so only the near-duplicate
+            # check catches it
+            n = random.randint(1, 3)
+            ending = random.choice(["?", " in practice?"])
+        records.append({
+            "question": f"Mock question {n} about {topic}: how do "
+                        f"fact{n}a, fact{n}b and fact{n}c fit together"
+                        f"{ending}",
+            "answer": f"Mock answer {n}, explaining one point about {topic}.",
+        })
+    if structured:
+        return json.dumps({"questions": records})
+    return "\n\n".join(
+        f"Q{i}: {r['question']}\nA{i}: {r['answer']}"
+        for i, r in enumerate(records, start=1)
+    )
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = staticmethod(lambda: 0.0)
+    error_rate = 0.0
+    duplicate_rate = 0.0
+    chunk_words = 4
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self.send_json(400, {"error": {"message": "Invalid JSON"}})
+
+        delay = max(0.0, self.latency())
+        if random.random() < self.error_rate:
+            time.sleep(delay / 2)
+            status = random.choice([429, 500, 502, 503])
+            return self.send_json(status, {"error": {"code": status}},
+                                  {"Retry-After": "1"} if status == 429 else None)
+
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        structured = bool(body.get("response_format"))
+        content = build_reply(prompt, structured, self.duplicate_rate)
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(content.split()),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if body.get("stream"):
+            return self.send_stream(body.get("model"), content, usage, delay)
+
+        time.sleep(delay)
+        self.send_json(200, {
+            "id": f"mock-{uuid.uuid4().hex}",
+            "model": body.get("model"),
+            "choices": [{"message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def send_json(self, status, data, headers=None):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_stream(self, model, content, usage, delay):
+        words = re.findall(r"\S+\s*", content)
+        pieces = ["".join(words[i:i + self.chunk_words])
+                  for i in range(0, len(words), self.chunk_words)]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_event(data):
+            self.wfile.write(f"data: {data}\n\n".encode())
+            self.wfile.flush()
+
+        self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+        for piece in pieces:
+            time.sleep(delay / max(1, len(pieces)))
+            send_event(json.dumps({
+                "model": model,
+                "choices": [{"delta": {"content": piece}}],
+            }))
+        send_event(json.dumps({"model": model, "choices": [], "usage": usage}))
+        send_event("[DONE]")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=0, latency="fixed:0", error_rate=0.0,
+                chunk_words=4, duplicate_rate=0.0):
+    """Create (but do not start) a mock server; port 0 picks a free port"""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "latency": staticmethod(parse_latency(latency)),
+        "error_rate": error_rate,
+        "duplicate_rate": duplicate_rate,
+        "chunk_words": chunk_words,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_background(**options):
+    """Start a mock server on a daemon thread and return (server, url)"""
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/api/v1/chat/completions"
+
+
+def main():
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=env("MOCK_OPENROUTER_HOST",
+                                              "127.0.0.1"))
+    parser.add_argument("--port", type=int,
+                        default=int(env("MOCK_OPENROUTER_PORT", "8999")))
+    parser.add_argument("--latency",
+                        default=env("MOCK_OPENROUTER_LATENCY", "fixed:1.0"))
+    parser.add_argument("--error-rate", type=float,
+                        default=float(env("MOCK_OPENROUTER_ERROR_RATE", "0")))
+    parser.add_argument("--chunk-words", type=int,
+                        default=int(env("MOCK_OPENROUTER_CHUNK_WORDS", "4")),
+                        help="words per streamed delta")
+    parser.add_argument("--duplicate-rate", type=float,
+                        default=float(env("MOCK_OPENROUTER_DUPLICATE_RATE",
+                                          "0")),
+                        help="share of questions that repeat another reply's")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.error_rate,
+                         args.chunk_words, args.duplicate_rate)
+    host, port = server.server_address[:2]
+    print(f"Mock OpenRouter on http://{host}:{port}/api/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Measure page weight and first vs. repeat visit cost of a page.
+
+    python benchmarks/page_weight.py --url http://127.0.0.1:5000/ --output results/after
+
+Loads the page and every same-origin stylesheet, image and script it
+references (including ``url(...)`` in inline styles), the way a browser
+with an empty cache would. It then repeats the visit the way a browser
+with a warm cache would: assets marked ``immutable`` or still fresh by
+``max-age`` are not requested, and the rest are revalidated with
+If-None-Match / If-Modified-Since. Bytes are counted as sent on the wire,
+i.e. after compression. ``--baseline`` compares with an earlier JSON run.
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_PATTERN = re.compile(
+    r"""(?:href|src)\s*=\s*["']([^"']+)["']|url\(\s*["']?([^"')]+)["']?\s*\)"""
+)
+
+
+def fetch(url, accept_encoding, validators=None):
+    headers = {"Accept-Encoding": accept_encoding}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    request = urllib.request.Request(url, headers=headers)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            body = response.read()
+            status, info = response.status, response.headers
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        status, info = e.code, e.headers
+    return {
+        "url": url,
+        "status": status,
+        "bytes": len(body),
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+        "encoding": info.get("Content-Encoding", "identity"),
+        "cache_control": info.get("Cache-Control", ""),
+        "etag": info.get("ETag"),
+        "last_modified": info.get("Last-Modified"),
+        "body": body,
+    }
+
+
+def find_assets(page_url, html):
+    origin = urllib.parse.urlsplit(page_url).netloc
+    assets = []
+    for match in ASSET_PATTERN.finditer(html):
+        link = urllib.parse.urljoin(page_url, match.group(1) or match.group(2))
+        parts = urllib.parse.urlsplit(link)
+        if parts.netloc == origin and parts.path.startswith("/static/"):
+            if link not in assets:
+                assets.append(link)
+    return assets
+
+
+def is_fresh(cache_control):
+    directives = [d.strip() for d in cache_control.lower().split(",")]
+    if "immutable" in directives:
+        return True
+    for directive in directives:
+        if directive.startswith("max-age="):
+            return int(directive[8:] or 0) > 0
+    return False
+
+
+def summarize(label, results):
+    total_bytes = sum(r["bytes"] for r in results)
+    requests = sum(1 for r in results if r["status"] is not None)
+    elapsed = sum(r["ms"] for r in results)
+    print(f"{label:<14} {requests:>3} requests  {total_bytes:>10,} bytes"
+          f"  {elapsed:>9.1f} ms (sequential)")
+    return {"requests": requests, "bytes": total_bytes,
+            "ms": round(elapsed, 2)}
+
+
+def visit(url, accept_encoding):
+    page = fetch(url, accept_encoding)
+    html = page["body"]
+    if page["encoding"] == "gzip":
+        html = gzip.decompress(html)
+    elif page["encoding"] == "br":
+        html = brotli.decompress(html)
+    assets = [fetch(link, accept_encoding)
+              for link in find_assets(url, html.decode("utf-8", "replace"))]
+    return page, assets
+
+
+def repeat_visit(url, accept_encoding, page, assets):
+    results = [fetch(url, accept_encoding, page)]
+    for asset in assets:
+        if is_fresh(asset["cache_control"]):
+            results.append({"url": asset["url"], "status": None, "bytes": 0,
+                            "ms": 0.0})
+        else:
+            results.append(fetch(asset["url"], accept_encoding, asset))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000/")
+    parser.add_argument("--accept-encoding",
+                        default="br, gzip" if brotli else "gzip",
+                        help='e.g. "identity" to measure without compression')
+    parser.add_argument("--output", help="artifact path without extension")
+    parser.add_argument("--baseline", help="earlier JSON artifact to compare")
+    args = parser.parse_args()
+
+    page, assets = visit(args.url, args.accept_encoding)
+    for item in [page] + assets:
+        print(f"  {item['status']} {item['bytes']:>10,} B {item['ms']:>8.1f} ms"
+              f"  {item['encoding']:<8} {item['cache_control'] or '-':<40}"
+              f"  {item['url']}")
+    first = summarize("first visit", [page] + assets)
+    repeat = summarize("repeat visit",
+                       repeat_visit(args.url, args.accept_encoding, page,
+                                    assets))
+
+    result = {"url": args.url, "first_visit": first, "repeat_visit": repeat}
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{args.output}.json", "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.output}.json")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nChange vs {args.baseline}:")
+        for visit_name in ("first_visit", "repeat_visit"):
+            changes = []
+            for field in ("requests", "bytes", "ms"):
+                old = baseline[visit_name][field]
+                new = result[visit_name][field]
+                if old:
+                    changes.append(f"{field} {(new - old) / old * 100:+.1f}%")
+            print(f"  {visit_name:<13} " + "  ".join(changes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(topic, difficulty, num_questions):
+    """Build a normalized key so trivially different requests share an entry"""
+    topic = " ".join(str(topic).lower().split())
+    return f"v2|{topic}|{str(difficulty).lower()}|{int(num_questions)}"
+
+
+class ResultCache:
+    """Two-tier cache: an in-process LRU in front of a shared SQLite table.
+
+    The SQLite tier survives restarts and is shared by every worker process
+    pointing at the same file. Pass ``path=None`` for a memory-only cache.
+    """
+
+    def __init__(self, path=None, ttl=86400, max_memory_items=256,
+                 max_disk_items=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.path:
+            try:
+                self._init_db()
+            except sqlite3.Error as e:
+                print(f"Cache warning: disabling disk tier - {e}")
+                self.path = None
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                       key TEXT PRIMARY KEY,
+                       value TEXT NOT NULL,
+                       expires REAL NOT NULL,
+                       accessed REAL NOT NULL
+                   )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_accessed"
+                " ON results (accessed)"
+            )
+
+    def _remember(self, key, value, expires):
+        with self._lock:
+            self._memory[key] = (expires, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key, record=True):
+        """Return the cached value for ``key`` or None on a miss.
+
+        Pass ``record=False`` to look up without touching hit/miss counts.
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    if record:
+                        self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+        if self.path:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, expires FROM results WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    with conn:
+                        conn.execute(
+                            "UPDATE results SET accessed = ? WHERE key = ?",
+                            (now, key)
+                        )
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    if record:
+                        with self._lock:
+                            self.disk_hits += 1
+                    return value
+            except sqlite3.Error as e:
+                print(f"Cache warning: read failed - {e}")
+
+        if record:
+            with self._lock:
+                self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """Store ``value`` in both tiers and evict expired or excess rows"""
+        now = time.time()
+        expires = now + self.ttl
+        self._remember(key, value, expires)
+
+        if not self.path:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results"
+                    " (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires, now)
+                )
+                conn.execute("DELETE FROM results WHERE expires <= ?", (now,))
+                conn.execute(
+                    """DELETE FROM results WHERE key IN (
+                           SELECT key FROM results
+                           ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                       )""",
+                    (self.max_disk_items,)
+                )
+        except sqlite3.Error as e:
+            print(f"Cache warning: write failed - {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM results")
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_items": len(self._memory),
+            }
@@ -0,0 +1,142 @@
+"""Cache-friendly, compressed response delivery for the Flask app.
+
+* Static URLs carry a content hash (``?v=...``); hashed requests are served
+  with a year-long ``immutable`` Cache-Control, unhashed ones revalidate.
+* HTML, CSS, JSON and other text responses are compressed with brotli (when
+  the ``brotli`` package is installed) or gzip. GET responses then get an
+  ETag so repeats can be answered with 304 Not Modified.
+* Streamed responses (SSE, NDJSON) are left untouched.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+MIN_COMPRESS_SIZE = 500
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_hashes = {}
+_compressed = {}
+_lock = threading.Lock()
+
+
+def asset_hash(path):
+    """Short content hash of a file, recomputed only when it changes"""
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _hashes.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _lock:
+        _hashes[path] = (stamp, digest)
+    return digest
+
+
+def choose_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, or None"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    # mtime=0 keeps the output (and so its ETag) stable between calls
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def init_app(app):
+    static_folder = app.static_folder
+
+    @app.url_defaults
+    def hash_static_urls(endpoint, values):
+        if endpoint != "static" or "v" in values:
+            return
+        path = os.path.join(static_folder, values.get("filename", ""))
+        try:
+            values["v"] = asset_hash(path)
+        except OSError:
+            pass
+
+    @app.context_processor
+    def static_helpers():
+        # Lets templates prefer optional variants built by optimize_assets.py
+        def static_exists(filename):
+            return os.path.exists(os.path.join(static_folder, filename))
+        return {"static_exists": static_exists}
+
+    @app.after_request
+    def deliver(response):
+        if request.endpoint == "static" and response.status_code in (200, 304):
+            path = os.path.join(static_folder, request.view_args["filename"])
+            version = request.args.get("v")
+            try:
+                current = asset_hash(path)
+            except OSError:
+                current = None
+            if version and version == current:
+                response.headers["Cache-Control"] = IMMUTABLE
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+
+        # send_file responses also count as streamed but are passthrough
+        # file wrappers; generator streams (SSE, NDJSON) are not
+        streamed = response.is_streamed and not response.direct_passthrough
+        if (response.status_code != 200
+                or streamed
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = None
+        if "Content-Encoding" not in response.headers:
+            encoding = choose_encoding(
+                request.headers.get("Accept-Encoding", ""))
+
+        # Read the file wrapper into memory so the body can be compressed
+        # and hashed; the static text files are small
+        response.direct_passthrough = False
+        data = response.get_data()
+        if encoding and len(data) >= MIN_COMPRESS_SIZE:
+            if request.endpoint == "static":
+                key = (request.path, response.get_etag()[0], encoding)
+                body = _compressed.get(key)
+                if body is None:
+                    body = compress(data, encoding)
+                    with _lock:
+                        _compressed[key] = body
+            else:
+                body = compress(data, encoding)
+            response.set_data(body)
+            response.headers["Content-Encoding"] = encoding
+
+        if request.method not in ("GET", "HEAD"):
+            return response
+        # Tag the bytes actually sent, so each encoding gets its own ETag
+        response.add_etag(overwrite=True)
+        return response.make_conditional(request)
@@ -0,0 +1,225 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+class Cancel:
+    """Cancel flag for one attempt that can also run callbacks when set.
+
+    ``add_callback`` lets an attempt close its response from the
+    cancelling thread, so a blocked read ends at once instead of at the
+    next line. A callback added after ``set()`` runs immediately.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            _run_callback(callback)
+
+    def add_callback(self, callback):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        _run_callback(callback)
+
+
+def _run_callback(callback):
+    try:
+        callback()
+    except Exception as e:
+        print(f"Hedging warning: cancel callback failed - {e}")
+
+
+class LatencyTracker:
+    """Rolling per-model latency windows used to pick hedge delays.
+
+    ``threshold(model)`` is the given percentile of the model's recent
+    successful latencies, never below ``floor``. Until ``min_samples`` are
+    recorded it returns ``default``. Attempts cancelled after running past
+    the threshold are kept too (``record_censored``), so a slow model's
+    tail does not vanish from its window just because it lost the race.
+    """
+
+    def __init__(self, window=200, percentile=0.9, min_samples=20,
+                 default=8.0, floor=0.5):
+        self.window = window
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default = default
+        self.floor = floor
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def record_censored(self, model, seconds):
+        # Only a lower bound on the real latency: a short one says nothing
+        # about the tail, a long one is at least as slow as the threshold
+        if seconds >= self.threshold(model):
+            self.record(model, seconds)
+
+    def _quantile(self, samples, fraction):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def threshold(self, model):
+        with self._lock:
+            samples = list(self._samples.get(model, ()))
+        if len(samples) < self.min_samples:
+            return self.default
+        return max(self.floor, self._quantile(samples, self.percentile))
+
+    def stats(self):
+        with self._lock:
+            snapshot = {m: list(s) for m, s in self._samples.items()}
+        return {
+            model: {
+                "samples": len(samples),
+                "p50": round(self._quantile(samples, 0.5), 3),
+                "p90": round(self._quantile(samples, 0.9), 3),
+                "hedge_after": round(self.threshold(model), 3),
+            }
+            for model, samples in snapshot.items() if samples
+        }
+
+
+def _hedge_timeout(tracker, model, started):
+    """Seconds until the newest attempt is due a hedge.
+
+    An attempt still queued has not started its clock, so the full
+    threshold is left.
+    """
+    threshold = tracker.threshold(model)
+    if not started:
+        return threshold
+    return max(0, threshold - (time.perf_counter() - started[0]))
+
+
+def hedged_call(models, call, tracker, pool, is_error, on_hedge=None):
+    """Call ``models`` in order, hedging slow or failed attempts.
+
+    ``call(model, cancel)`` runs on ``pool`` and should stop early once
+    ``cancel`` (a Cancel) is set. The next model is started when the newest
+    attempt has run longer than its tracker threshold, counted from when it
+    left the pool's queue, or straight away when an attempt fails, even if
+    others are still running. The first successful result wins and the
+    other attempts are cancelled. ``on_hedge(model, reason)`` is called for
+    each extra attempt; recording latencies into ``tracker`` is left to
+    ``call``.
+    """
+    attempts = {}
+    next_index = 0
+    last_error = None
+
+    def launch(reason=None):
+        nonlocal next_index
+        model = models[next_index]
+        next_index += 1
+        if reason and on_hedge:
+            on_hedge(model, reason)
+        cancel = Cancel()
+        started = []
+
+        def run():
+            started.append(time.perf_counter())
+            return call(model, cancel)
+
+        future = pool.submit(run)
+        attempts[future] = (model, cancel)
+        return model, started
+
+    newest = launch()
+    while attempts:
+        timeout = None
+        if next_index < len(models):
+            timeout = _hedge_timeout(tracker, *newest)
+        done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            if _hedge_timeout(tracker, *newest) == 0:
+                newest = launch("slow")
+            continue
+
+        for future in done:
+            attempts.pop(future)
+            result = future.result()
+            if not is_error(result):
+                for other, (_, cancel) in attempts.items():
+                    cancel.set()
+                    other.cancel()
+                return result
+            last_error = result
+
+        # Only failures get here; replace them without waiting on the rest
+        if next_index < len(models):
+            newest = launch("failed")
+    return last_error
+
+
+async def hedged_call_async(models, call, tracker, is_error, on_hedge=None):
+    """Async counterpart of hedged_call; losers are cancelled as tasks"""
+    attempts = {}
+    next_index = 0
+    last_error = None
+
+    def launch(reason=None):
+        nonlocal next_index
+        model = models[next_index]
+        next_index += 1
+        if reason and on_hedge:
+            on_hedge(model, reason)
+        started = []
+
+        async def run():
+            started.append(time.perf_counter())
+            return await call(model)
+
+        task = asyncio.ensure_future(run())
+        attempts[task] = model
+        return model, started
+
+    newest = launch()
+    try:
+        while attempts:
+            timeout = None
+            if next_index < len(models):
+                timeout = _hedge_timeout(tracker, *newest)
+            done, _ = await asyncio.wait(attempts, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if _hedge_timeout(tracker, *newest) == 0:
+                    newest = launch("slow")
+                continue
+
+            for task in done:
+                attempts.pop(task)
+                result = task.result()
+                if not is_error(result):
+                    return result
+                last_error = result
+
+            if next_index < len(models):
+                newest = launch("failed")
+        return last_error
+    finally:
+        for task in attempts:
+            task.cancel()
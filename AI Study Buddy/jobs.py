@@ -0,0 +1,249 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """Bounded background job queue whose state lives in SQLite.
+
+    Jobs are rows in a shared table, so any worker process can pick up a
+    job submitted by another and any process can answer a status poll.
+    Queued or running jobs with the same key are deduplicated, a running
+    job's lease is renewed while it works so a crashed worker's job is
+    retried, and finished jobs are deleted after ``ttl`` seconds.
+    """
+
+    def __init__(self, path, run, is_error=lambda result: False, workers=4,
+                 max_queued=100, ttl=3600, lease_seconds=120,
+                 poll_interval=0.5):
+        self.path = path
+        self.run = run
+        self.is_error = is_error
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._started_pid = None
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                       id TEXT PRIMARY KEY,
+                       key TEXT NOT NULL,
+                       params TEXT NOT NULL,
+                       status TEXT NOT NULL,
+                       result TEXT,
+                       error TEXT,
+                       created REAL NOT NULL,
+                       updated REAL NOT NULL,
+                       lease_until REAL
+                   )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Start this process's worker threads (safe to call repeatedly)"""
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}",
+                             daemon=True).start()
+
+    def submit(self, key, params):
+        """Queue a job, or return the queued/running one with the same key.
+
+        Returns ``(job_id, created)``; raises QueueFull when the queue
+        already holds ``max_queued`` jobs.
+        """
+        self.start()
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire(conn, now)
+            row = conn.execute(
+                """SELECT id FROM jobs
+                   WHERE key = ? AND status IN ('queued', 'running')""",
+                (key,)
+            ).fetchone()
+            if row:
+                conn.execute("COMMIT")
+                return row[0], False
+
+            (queued,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()
+            if queued >= self.max_queued:
+                conn.execute("COMMIT")
+                raise QueueFull()
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                """INSERT INTO jobs (id, key, params, status, created, updated)
+                   VALUES (?, ?, ?, 'queued', ?, ?)""",
+                (job_id, key, json.dumps(params), now, now)
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id, True
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if unknown or expired"""
+        row = self._connect().execute(
+            """SELECT id, status, params, result, error, created, updated
+               FROM jobs WHERE id = ?""",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "params": json.loads(row[2]),
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "created": row[5],
+            "updated": row[6],
+        }
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; a running job's result is dropped"""
+        cursor = self._connect().execute(
+            """UPDATE jobs SET status = 'cancelled', updated = ?
+               WHERE id = ? AND status IN ('queued', 'running')""",
+            (time.time(), job_id)
+        )
+        return cursor.rowcount == 1
+
+    def stats(self):
+        """Number of stored jobs by status"""
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+        ).fetchall()
+        counts = {status: 0 for status in
+                  ("queued", "running", "done", "failed", "cancelled",
+                   "expired")}
+        counts.update(rows)
+        return counts
+
+    def _expire(self, conn, now):
+        conn.execute(
+            """DELETE FROM jobs
+               WHERE status NOT IN ('queued', 'running') AND updated < ?""",
+            (now - self.ttl,)
+        )
+        conn.execute(
+            """UPDATE jobs SET status = 'expired', updated = ?
+               WHERE status = 'queued' AND created < ?""",
+            (now, now - self.ttl)
+        )
+
+    def _claim(self):
+        """Atomically move the oldest runnable job to 'running'"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                """SELECT id, params FROM jobs
+                   WHERE status = 'queued'
+                      OR (status = 'running' AND lease_until < ?)
+                   ORDER BY created LIMIT 1""",
+                (now,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    """UPDATE jobs SET status = 'running', updated = ?,
+                                       lease_until = ?
+                       WHERE id = ?""",
+                    (now, now + self.lease_seconds, row[0])
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _renew(self, job_id, stop):
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                self._connect().execute(
+                    """UPDATE jobs SET lease_until = ?
+                       WHERE id = ? AND status = 'running'""",
+                    (time.time() + self.lease_seconds, job_id)
+                )
+            except sqlite3.Error as e:
+                print(f"Job warning: lease renewal failed - {e}")
+
+    def _finish(self, job_id, result=None, error=None):
+        status = "failed" if error else "done"
+        # The status guard keeps a cancellation that raced the worker
+        self._connect().execute(
+            """UPDATE jobs SET status = ?, result = ?, error = ?, updated = ?,
+                               lease_until = NULL
+               WHERE id = ? AND status = 'running'""",
+            (status, None if error else json.dumps(result), error,
+             time.time(), job_id)
+        )
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job warning: claim failed - {e}")
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            job_id, params = job
+            stop = threading.Event()
+            threading.Thread(target=self._renew, args=(job_id, stop),
+                             daemon=True).start()
+            try:
+                result = self.run(json.loads(params))
+                if self.is_error(result):
+                    self._finish(job_id, error=result)
+                else:
+                    self._finish(job_id, result=result)
+            except Exception as e:
+                print(f"Job Error: {e}")
+                self._finish(job_id, error="Error: Job failed unexpectedly.")
+            finally:
+                stop.set()
@@ -0,0 +1,335 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain dicts behind one lock. When
+``STUDY_BUDDY_METRICS_DIR`` is set, every process writes a snapshot of its
+own values to that directory about once a second, and ``render()`` sums
+the snapshots of all processes, so any gunicorn worker can serve /metrics.
+Snapshots of processes that have exited, or stopped flushing, are folded
+into one retired snapshot (counters only) and deleted.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+METRICS_DIR = os.getenv("STUDY_BUDDY_METRICS_DIR")
+FLUSH_INTERVAL = 1.0
+# A snapshot this much older than the flush interval belongs to a process
+# that is gone, or to a pid since reused by something else
+STALE_AFTER = 10 * FLUSH_INTERVAL
+RETIRED_FILE = "metrics-retired.json"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60)
+
+_lock = threading.Lock()
+_metrics = {}
+_collectors = []
+_flusher = None
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        with _lock:
+            _metrics[name] = self
+        _start_flusher()
+
+    def _key(self, labels):
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self):
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": [[list(k), v] for k, v in self.values.items()],
+        }
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0.0, 0]
+                self.values[key] = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        data = super().snapshot()
+        data["values"] = [[k, [list(v[0]), v[1], v[2]]]
+                          for k, v in data["values"]]
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+def add_collector(name, documentation, metric_type, labelnames, collect):
+    """Expose values computed at snapshot time.
+
+    ``collect()`` returns ``{label_values_tuple: value}``; use it for
+    counts that already live elsewhere, such as cache statistics.
+    """
+    _collectors.append((name, documentation, metric_type,
+                        list(labelnames), collect))
+
+
+def snapshot(final=False):
+    """This process's metrics as a JSON-serializable dict"""
+    with _lock:
+        data = {name: m.snapshot() for name, m in _metrics.items()}
+    for name, documentation, metric_type, labelnames, collect in _collectors:
+        try:
+            values = collect()
+        except Exception as e:
+            print(f"Metrics warning: collector {name} failed - {e}")
+            continue
+        data[name] = {
+            "type": metric_type,
+            "help": documentation,
+            "labelnames": labelnames,
+            "values": [[list(k), v] for k, v in values.items()],
+        }
+    if final:
+        _drop_gauges(data)
+    return {"pid": os.getpid(), "metrics": data}
+
+
+def _drop_gauges(data):
+    # In-flight gauges of an exited process must not linger in the sum
+    for metric in data.values():
+        if metric["type"] == "gauge":
+            metric["values"] = []
+
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def flush(final=False):
+    if not METRICS_DIR:
+        return
+    path = _snapshot_path(os.getpid())
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot(final=final), f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Metrics warning: flush failed - {e}")
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def _start_flusher():
+    global _flusher
+    if not METRICS_DIR or _flusher is not None:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _flusher = threading.Thread(target=_flush_loop, name="metrics-flush",
+                                daemon=True)
+    _flusher.start()
+    atexit.register(flush, final=True)
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        # os.kill would terminate the process; rely on the mtime there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _is_live(path, snap):
+    pid = snap.get("pid")
+    if pid is None:
+        return True
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        return False
+    return age <= STALE_AFTER and _pid_alive(pid)
+
+
+@contextmanager
+def _dir_lock():
+    with open(os.path.join(METRICS_DIR, "metrics.lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _retire(path, snap):
+    """Fold a gone process's counters into the retired snapshot.
+
+    Renaming the file first means only one process folds it, even when
+    several render /metrics at once.
+    """
+    claimed = f"{path}.{os.getpid()}.retiring"
+    try:
+        os.rename(path, claimed)
+    except OSError:
+        return
+    _drop_gauges(snap["metrics"])
+    retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+    try:
+        with _dir_lock():
+            total = {}
+            try:
+                with open(retired_path) as f:
+                    _merge(total, json.load(f))
+            except (OSError, ValueError):
+                pass
+            _merge(total, snap)
+            data = {name: {**metric, "values": [[list(k), v] for k, v
+                                                in metric["values"].items()]}
+                    for name, metric in total.items()}
+            tmp_path = f"{retired_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"pid": None, "metrics": data}, f)
+            os.replace(tmp_path, retired_path)
+        os.remove(claimed)
+    except OSError as e:
+        print(f"Metrics warning: retiring {path} failed - {e}")
+
+
+def _merge(total, snap):
+    for name, metric in snap["metrics"].items():
+        merged = total.setdefault(name, {**metric, "values": {}})
+        for labels, value in metric["values"]:
+            key = tuple(labels)
+            current = merged["values"].get(key)
+            if current is None:
+                merged["values"][key] = value
+            elif metric["type"] == "histogram":
+                merged["values"][key] = [
+                    [a + b for a, b in zip(current[0], value[0])],
+                    current[1] + value[1],
+                    current[2] + value[2],
+                ]
+            else:
+                merged["values"][key] = current + value
+
+
+def _escape(value):
+    return (str(value).replace("\\", "\\\\").replace('"', '\\"')
+            .replace("\n", "\\n"))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _read_snapshots():
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        try:
+            with open(path) as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        yield path, snap
+
+
+def render():
+    """Prometheus text exposition of all processes' metrics"""
+    own = snapshot()
+    snapshots = [own]
+    if METRICS_DIR:
+        for path, snap in _read_snapshots():
+            if snap.get("pid") != own["pid"] and not _is_live(path, snap):
+                _retire(path, snap)
+        for path, snap in _read_snapshots():
+            if snap.get("pid") != own["pid"] and _is_live(path, snap):
+                snapshots.append(snap)
+
+    total = {}
+    for snap in snapshots:
+        _merge(total, snap)
+
+    lines = []
+    for name in sorted(total):
+        metric = total[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+        for labels, value in sorted(metric["values"].items()):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(names, labels)} {value}")
+                continue
+            buckets, total_sum, count = value
+            cumulative = 0
+            for bound, bucket in zip(metric["buckets"], buckets):
+                cumulative += bucket
+                lines.append(
+                    f"{name}_bucket"
+                    f"{_format_labels(names, labels, ('le', bound))}"
+                    f" {cumulative}"
+                )
+            lines.append(
+                f"{name}_bucket{_format_labels(names, labels, ('le', '+Inf'))}"
+                f" {count}"
+            )
+            lines.append(f"{name}_sum{_format_labels(names, labels)} {total_sum}")
+            lines.append(f"{name}_count{_format_labels(names, labels)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,88 @@
+"""Build optional optimized variants of the static assets.
+
+    python optimize_assets.py [--max-width 1920] [--quality 80]
+
+* ``static/background.webp`` and ``static/background.progressive.jpg``
+  (needs Pillow). base.html serves them in place of ``background.jpg``
+  whenever they exist; delete them to go back to the original.
+* ``.gz`` (and ``.br`` when the ``brotli`` package is installed) copies of
+  the CSS/JS files, for a front-end proxy with ``gzip_static`` enabled.
+  The app itself compresses on the fly and does not need them.
+"""
+import argparse
+import glob
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "static")
+
+
+def report(source, target):
+    before = os.path.getsize(source)
+    after = os.path.getsize(target)
+    print(f"{os.path.basename(target):<32} {before:>10,} -> {after:>10,} bytes"
+          f"  ({(after - before) / before:+.0%})")
+
+
+def build_images(max_width, quality):
+    source = os.path.join(STATIC_DIR, "background.jpg")
+    if Image is None:
+        print("Pillow is not installed; skipping image variants "
+              "(pip install Pillow)")
+        return
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        if max_width and image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        webp = os.path.join(STATIC_DIR, "background.webp")
+        image.save(webp, "WEBP", quality=quality, method=6)
+        report(source, webp)
+
+        progressive = os.path.join(STATIC_DIR, "background.progressive.jpg")
+        image.save(progressive, "JPEG", quality=quality, optimize=True,
+                   progressive=True)
+        report(source, progressive)
+
+
+def build_compressed():
+    for path in sorted(glob.glob(os.path.join(STATIC_DIR, "*.css"))
+                       + glob.glob(os.path.join(STATIC_DIR, "*.js"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        report(path, path + ".gz")
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+            report(path, path + ".br")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-width", type=int, default=1920,
+                        help="downscale wider images (0 keeps the size)")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--skip-images", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_images:
+        build_images(args.max_width, args.quality)
+    build_compressed()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import json
+import re
+
+QUESTION_RE = re.compile(r"^\s*\**\s*Q(\d+)\s*[:.)]\**\s*(.*)$", re.IGNORECASE)
+ANSWER_RE = re.compile(r"^\s*\**\s*A(\d+)\s*[:.)]\**\s*(.*)$", re.IGNORECASE)
+
+
+class QAStreamParser:
+    """Incrementally turn "Q1:/A1:" text into question/answer pairs.
+
+    Feed text as it arrives; a pair is emitted once the next question starts
+    (or the stream finishes), so answers may span several lines.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._question = None
+        self._answer = None
+
+    def feed(self, text):
+        """Consume a chunk of text and return the pairs it completed"""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        pairs = []
+        for line in lines:
+            pair = self._consume(line)
+            if pair:
+                pairs.append(pair)
+        return pairs
+
+    def finish(self):
+        """Flush buffered text and return any pairs still pending"""
+        pairs = []
+        if self._buffer:
+            pair = self._consume(self._buffer)
+            self._buffer = ""
+            if pair:
+                pairs.append(pair)
+        pair = self._emit()
+        if pair:
+            pairs.append(pair)
+        return pairs
+
+    def _consume(self, line):
+        question = QUESTION_RE.match(line)
+        if question:
+            pair = self._emit()
+            self._question = [question.group(2).strip()]
+            return pair
+
+        answer = ANSWER_RE.match(line)
+        if answer and self._question is not None and self._answer is None:
+            self._answer = [answer.group(2).strip()]
+        elif line.strip():
+            if self._answer is not None:
+                self._answer.append(line.strip())
+            elif self._question is not None:
+                self._question.append(line.strip())
+        return None
+
+    def _emit(self):
+        if self._question is None:
+            return None
+        pair = {
+            "question": "\n".join(self._question).strip(),
+            "answer": "\n".join(self._answer or []).strip(),
+        }
+        self._question = None
+        self._answer = None
+        return pair
+
+
+def parse_questions(text):
+    """Parse a complete "Q1:/A1:" response into question/answer pairs"""
+    parser = QAStreamParser()
+    return parser.feed(text) + parser.finish()
+
+
+def normalize_question(text):
+    """Reduce a question to lowercase words for duplicate detection"""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def merge_questions(parts, limit=None, similar=None):
+    """Merge parsed pair lists, dropping repeated questions.
+
+    ``similar(question, other)``, if given, also drops a question that
+    is close to one already kept.
+    """
+    seen = set()
+    merged = []
+    for pairs in parts:
+        for pair in pairs:
+            key = normalize_question(pair["question"])
+            if not key or key in seen:
+                continue
+            if similar and any(similar(pair["question"], kept["question"])
+                               for kept in merged):
+                continue
+            seen.add(key)
+            merged.append(pair)
+    return merged[:limit] if limit else merged
+
+
+def parse_response(content):
+    """Parse a model reply into question/answer records.
+
+    Structured JSON (``{"questions": [{"question", "answer"}]}``) is
+    preferred; replies that are not valid JSON fall back to the
+    "Q1:/A1:" text parser.
+    """
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[len("json"):]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return parse_questions(content)
+
+    items = data.get("questions", []) if isinstance(data, dict) else data
+    records = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        question = str(item.get("question") or item.get("q") or "").strip()
+        answer = str(item.get("answer") or item.get("a") or "").strip()
+        if question:
+            records.append({"question": question, "answer": answer})
+    return records
@@ -0,0 +1,171 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from qa_parser import normalize_question
+
+STOPWORDS = {
+    "the", "and", "are", "was", "were", "for", "with", "that", "this",
+    "from", "into", "its", "what", "which", "does", "did", "how", "why",
+    "when", "where", "who", "whom", "can", "you", "your", "not", "has",
+    "have", "had", "explain", "describe", "define",
+}
+
+
+def normalize_topic(topic):
+    return " ".join(str(topic).lower().split())
+
+
+def _terms(text):
+    return set(re.findall(r"\w{3,}", text.lower())) - STOPWORDS
+
+
+class QuestionBank:
+    """SQLite FTS5 store of every generated question, keyed by topic.
+
+    Questions are looked up by difficulty plus a full-text match on all the
+    words of the requested topic, so a bank entry for "photosynthesis in
+    plants" can serve a request for "photosynthesis". New questions that
+    are near-duplicates (word overlap at or above ``similarity``) of one
+    already stored for the same topic are dropped.
+    """
+
+    def __init__(self, path, similarity=0.7):
+        self.path = path
+        self.similarity = similarity
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.served = 0
+        self.stored = 0
+        self.duplicates = 0
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    UNIQUE (topic, difficulty, fingerprint)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                    topic, question, answer,
+                    content='questions', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS questions_ai
+                AFTER INSERT ON questions BEGIN
+                    INSERT INTO questions_fts (rowid, topic, question, answer)
+                    VALUES (new.id, new.topic, new.question, new.answer);
+                END;
+                CREATE TRIGGER IF NOT EXISTS questions_ad
+                AFTER DELETE ON questions BEGIN
+                    INSERT INTO questions_fts
+                        (questions_fts, rowid, topic, question, answer)
+                    VALUES ('delete', old.id, old.topic, old.question,
+                            old.answer);
+                END;
+                """
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def find(self, topic, difficulty, limit):
+        """Return up to ``limit`` stored records matching topic/difficulty"""
+        words = re.findall(r"\w+", normalize_topic(topic))
+        if not words or limit <= 0:
+            return []
+        match = " AND ".join(f'topic : "{word}"' for word in words)
+        try:
+            rows = self._connect().execute(
+                """SELECT q.question, q.answer
+                   FROM questions_fts JOIN questions q
+                        ON q.id = questions_fts.rowid
+                   WHERE questions_fts MATCH ? AND q.difficulty = ?
+                   ORDER BY q.topic = ? DESC, random()
+                   LIMIT ?""",
+                (match, difficulty, normalize_topic(topic), limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Question bank warning: lookup failed - {e}")
+            return []
+        with self._lock:
+            self.served += len(rows)
+        return [{"question": q, "answer": a} for q, a in rows]
+
+    def similar(self, question, other):
+        """True if two questions overlap enough to count as the same one"""
+        return self._overlap(_terms(question), _terms(other))
+
+    def _overlap(self, terms, other):
+        if not terms or not other:
+            return False
+        return len(terms & other) / len(terms | other) >= self.similarity
+
+    def _is_near_duplicate(self, conn, topic, difficulty, question):
+        terms = _terms(question)
+        if not terms:
+            return False
+        match = "question : (" + " OR ".join(f'"{t}"' for t in terms) + ")"
+        candidates = conn.execute(
+            """SELECT q.question
+               FROM questions_fts JOIN questions q
+                    ON q.id = questions_fts.rowid
+               WHERE questions_fts MATCH ? AND q.topic = ?
+                     AND q.difficulty = ?
+               ORDER BY rank LIMIT 20""",
+            (match, topic, difficulty)
+        ).fetchall()
+        return any(self._overlap(terms, _terms(existing))
+                   for (existing,) in candidates)
+
+    def add(self, topic, difficulty, records):
+        """Store new records, skipping exact and near duplicates"""
+        topic = normalize_topic(topic)
+        stored = 0
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                for record in records:
+                    question = record["question"]
+                    if self._is_near_duplicate(conn, topic, difficulty,
+                                               question):
+                        continue
+                    cursor = conn.execute(
+                        """INSERT OR IGNORE INTO questions
+                           (topic, difficulty, question, answer, fingerprint,
+                            created)
+                           VALUES (?, ?, ?, ?, ?, ?)""",
+                        (topic, difficulty, question, record["answer"],
+                         normalize_question(question), now)
+                    )
+                    stored += cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Question bank warning: write failed - {e}")
+        with self._lock:
+            self.stored += stored
+            self.duplicates += len(records) - stored
+        return stored
+
+    def stats(self):
+        with self._lock:
+            return {
+                "served": self.served,
+                "stored": self.stored,
+                "duplicates_skipped": self.duplicates,
+            }
@@ -0,0 +1,254 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Broadcast:
+    """Items produced once and replayed to every follower, in order"""
+
+    def __init__(self):
+        self.items = []
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            self.items.append(item)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def follow(self):
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: index < len(self.items) or self.closed)
+                if index >= len(self.items):
+                    return
+                item = self.items[index]
+            index += 1
+            yield item
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    Within a process, callers that arrive while a key is in flight wait for
+    the leader and share its result. With ``lock_db`` set, leaders also take
+    a lease row in SQLite so other worker processes wait for the result to
+    appear (through ``lookup``) instead of repeating the call.
+    """
+
+    def __init__(self, lock_db=None, lease_seconds=60, poll_interval=0.2):
+        self.lock_db = lock_db
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._calls = {}
+        self._tasks = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.remote_coalesced = 0
+
+        if self.lock_db:
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS inflight (
+                               key TEXT PRIMARY KEY,
+                               owner TEXT NOT NULL,
+                               expires REAL NOT NULL
+                           )"""
+                    )
+            except sqlite3.Error as e:
+                print(f"Single-flight warning: disabling shared locks - {e}")
+                self.lock_db = None
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.lock_db, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def do(self, key, fn, lookup=None):
+        """Run ``fn()`` once for all concurrent callers of ``key``.
+
+        ``lookup`` returns the shared result (e.g. from a cross-process
+        cache) or None; it enables waiting on other worker processes.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, lookup)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _run(self, key, fn, lookup):
+        if not self.lock_db or lookup is None:
+            return fn()
+
+        deadline = time.time() + self.lease_seconds
+        while not self._acquire(key):
+            result = lookup()
+            if result is not None:
+                with self._lock:
+                    self.remote_coalesced += 1
+                return result
+            if time.time() > deadline:
+                break
+            time.sleep(self.poll_interval)
+
+        try:
+            # Another worker may have finished between our lookups
+            result = lookup()
+            if result is not None:
+                with self._lock:
+                    self.remote_coalesced += 1
+                return result
+            return fn()
+        finally:
+            self._release(key)
+
+    def _acquire(self, key):
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "DELETE FROM inflight WHERE key = ? AND expires <= ?",
+                    (key, now)
+                )
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO inflight (key, owner, expires)"
+                    " VALUES (?, ?, ?)",
+                    (key, self.owner, now + self.lease_seconds)
+                )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Single-flight warning: lease failed - {e}")
+            return True
+
+    def _release(self, key):
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "DELETE FROM inflight WHERE key = ? AND owner = ?",
+                    (key, self.owner)
+                )
+        except sqlite3.Error as e:
+            print(f"Single-flight warning: release failed - {e}")
+
+    async def do_async(self, key, fn):
+        """Await ``fn()`` once for all concurrent callers of ``key``.
+
+        The shared call runs as its own task, so a caller that disconnects
+        does not cancel the work the other callers are waiting on.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                task = asyncio.ensure_future(fn())
+                self._tasks[key] = task
+                self.leaders += 1
+                task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stream(self, key, fn, lookup=None):
+        """Iterate ``fn()`` once for all concurrent callers of ``key``.
+
+        The leader's items are produced on a background thread and every
+        caller, the first one included, gets all of them in order: late
+        joiners replay what was already produced, then follow live. A
+        caller that disconnects does not stop the others. With ``lock_db``
+        and ``lookup`` (which returns the complete item list or None),
+        callers in other worker processes wait for that list instead.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._streams[key] = _Broadcast()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            def produce():
+                produced = []
+
+                def run():
+                    for item in fn():
+                        produced.append(item)
+                        broadcast.put(item)
+                    return produced
+
+                try:
+                    result = self._run(key, run, lookup)
+                    if result is not produced:
+                        # Finished by another worker process
+                        for item in result:
+                            broadcast.put(item)
+                except Exception as e:
+                    print(f"Single-flight warning: stream failed - {e}")
+                finally:
+                    with self._lock:
+                        self._streams.pop(key, None)
+                    broadcast.close()
+
+            threading.Thread(target=produce, daemon=True).start()
+        return broadcast.follow()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "remote_coalesced": self.remote_coalesced,
+                "in_flight": (len(self._calls) + len(self._tasks)
+                              + len(self._streams)),
+            }
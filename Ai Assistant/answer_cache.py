@@ -0,0 +1,166 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "answer_cache.db")
+MEMORY_SIZE = 256
+
+DAY = 24 * 60 * 60
+
+# Per command: (fresh for, then served stale while refreshing for) seconds.
+# Past both, a stale answer is still used if the lookup fails.
+TTLS = {
+    "wikipedia": (7 * DAY, 30 * DAY),
+    "ip": (10 * 60, DAY),
+}
+DEFAULT_TTL = (60 * 60, DAY)
+
+
+class AnswerCache:
+    # Answers from network lookups, kept in a small in-memory LRU in front
+    # of a SQLite file so they survive restarts. Each entry remembers how
+    # long its lookup took, which is the latency saved on every hit.
+
+    def __init__(self, path=CACHE_FILE, memory_size=MEMORY_SIZE, ttls=TTLS):
+        self.path = path
+        self.memory_size = memory_size
+        self.ttls = ttls
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._stats = {"hits": 0, "stale": 0, "misses": 0,
+                       "stale_on_error": 0, "refreshes": 0, "errors": 0}
+        self._saved = 0.0
+        self._disk_ok = True
+        try:
+            with self._connect() as db:
+                db.execute("CREATE TABLE IF NOT EXISTS answers ("
+                           "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                           "stored_at REAL NOT NULL, "
+                           "fetch_seconds REAL NOT NULL)")
+        except sqlite3.Error as e:
+            # Still worth caching in memory for this session
+            print(f"Answer cache on disk unavailable: {e}")
+            self._disk_ok = False
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager commits but never closes
+        with closing(sqlite3.connect(self.path, timeout=5)) as db, db:
+            yield db
+
+    def get(self, kind, query, fetch):
+        # Return the answer for query, calling fetch() only when there is no
+        # usable cached one. Errors from fetch() are raised only if there
+        # is nothing cached at all.
+        key = f"{kind}:{' '.join(query.lower().split())}"
+        ttl, stale_for = self.ttls.get(kind, DEFAULT_TTL)
+        entry = self._lookup(key)
+        if entry is not None:
+            value, stored_at, fetch_seconds = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self._count("hits", fetch_seconds)
+                return value
+            if age < ttl + stale_for:
+                self._count("stale", fetch_seconds)
+                self._refresh_in_background(key, fetch)
+                return value
+
+        self._count("misses")
+        try:
+            return self._fetch(key, fetch)
+        except Exception:
+            if entry is None:
+                self._count("errors")
+                raise
+            # The network blipped; an old answer beats no answer
+            self._count("stale_on_error", entry[2])
+            return entry[0]
+
+    def _fetch(self, key, fetch):
+        started = time.perf_counter()
+        value = fetch()
+        self._store(key, value, time.perf_counter() - started)
+        return value
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._fetch(key, fetch)
+                self._count("refreshes")
+            except Exception as e:
+                print(f"Refreshing {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if not self._disk_ok:
+            return None
+        try:
+            with self._connect() as db:
+                row = db.execute("SELECT value, stored_at, fetch_seconds "
+                                 "FROM answers WHERE key = ?",
+                                 (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Answer cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        entry = (json.loads(row[0]), row[1], row[2])
+        self._remember(key, entry)
+        return entry
+
+    def _store(self, key, value, fetch_seconds):
+        entry = (value, time.time(), fetch_seconds)
+        self._remember(key, entry)
+        if not self._disk_ok:
+            return
+        try:
+            with self._connect() as db:
+                db.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                           (key, json.dumps(value), entry[1], fetch_seconds))
+        except sqlite3.Error as e:
+            print(f"Answer cache write failed: {e}")
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _count(self, outcome, saved=0.0):
+        with self._lock:
+            self._stats[outcome] += 1
+            self._saved += saved
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["saved_seconds"] = round(self._saved, 2)
+        served = stats["hits"] + stats["stale"]
+        lookups = served + stats["misses"]
+        stats["hit_rate"] = round(served / lookups, 2) if lookups else 0.0
+        return stats
+
+
+answer_cache = AnswerCache()
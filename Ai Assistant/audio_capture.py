@@ -0,0 +1,135 @@
+import threading
+import numpy as np
+import sounddevice as sd
+import speech_recognition as sr
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+BUFFER_SECONDS = 30
+
+# Voice activity detection
+MIN_ENERGY = 300          # RMS below this is always silence
+SPEECH_RATIO = 3.0        # speech must be this many times the noise floor
+START_FRAMES = 3          # consecutive loud frames that start an utterance
+END_SILENCE = 0.8         # seconds of quiet that end it
+PRE_ROLL = 0.3            # seconds kept from before the start was detected
+
+
+class RingBuffer:
+    # Fixed block of int16 samples. Positions are absolute sample counts,
+    # so readers can keep their place while the writer wraps around.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.written = 0
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self._cond = threading.Condition()
+
+    def write(self, samples):
+        samples = samples[-self.capacity:]
+        count = len(samples)
+        start = self.written % self.capacity
+        first = min(count, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:count - first] = samples[first:]
+        with self._cond:
+            self.written += count
+            self._cond.notify_all()
+
+    def wait_for(self, position, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.written >= position,
+                                       timeout)
+
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    def read(self, start, end):
+        # A view when the span doesn't wrap, so frame checks copy nothing
+        start = max(start, self.oldest())
+        first = start % self.capacity
+        last = first + (end - start)
+        if last <= self.capacity:
+            return self._data[first:last]
+        return np.concatenate((self._data[first:],
+                               self._data[:last - self.capacity]))
+
+
+class MicListener:
+    # Keeps one input stream open and cuts utterances out of it by energy,
+    # so a turn lasts as long as the user speaks instead of a fixed window.
+
+    def __init__(self, samplerate=SAMPLE_RATE, frame_ms=FRAME_MS,
+                 buffer_seconds=BUFFER_SECONDS):
+        self.samplerate = samplerate
+        self.frame = samplerate * frame_ms // 1000
+        self.ring = RingBuffer(samplerate * buffer_seconds)
+        self.noise_floor = MIN_ENERGY / SPEECH_RATIO
+        self._stream = None
+
+    def start(self):
+        if self._stream is None:
+            self._stream = sd.InputStream(
+                samplerate=self.samplerate, channels=1, dtype="int16",
+                blocksize=self.frame, callback=self._callback
+            )
+            self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        # PortAudio reuses indata, so this copy into the ring is the only one
+        # until the finished utterance is handed over
+        self.ring.write(indata[:, 0])
+
+    def energy(self, samples):
+        return float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
+
+    def is_speech(self, energy):
+        return energy >= max(MIN_ENERGY, self.noise_floor * SPEECH_RATIO)
+
+    def listen(self, start_timeout=5, max_seconds=15):
+        # Returns the next utterance as sr.AudioData, or None if nobody
+        # spoke within start_timeout seconds
+        self.start()
+        rate = self.samplerate
+        position = self.ring.written
+        deadline = position + int(start_timeout * rate)
+        end_frames = int(END_SILENCE * rate / self.frame)
+        loud = 0
+        quiet = 0
+        start = None
+
+        while True:
+            if not self.ring.wait_for(position + self.frame, timeout=2):
+                print("Microphone stopped delivering audio")
+                return None
+            position = max(position, self.ring.oldest())
+            energy = self.energy(self.ring.read(position, position + self.frame))
+            position += self.frame
+
+            if start is None:
+                if self.is_speech(energy):
+                    loud += 1
+                    if loud >= START_FRAMES:
+                        start = position - (loud * self.frame
+                                            + int(PRE_ROLL * rate))
+                else:
+                    loud = 0
+                    # Track background noise only while nobody is talking
+                    self.noise_floor = 0.95 * self.noise_floor + 0.05 * energy
+                    if position >= deadline:
+                        return None
+                continue
+
+            quiet = 0 if self.is_speech(energy) else quiet + 1
+            if quiet >= end_frames or position - start >= max_seconds * rate:
+                break
+
+        start = max(start, self.ring.oldest())
+        samples = self.ring.read(start, position)
+        return sr.AudioData(samples.tobytes(), rate, 2)
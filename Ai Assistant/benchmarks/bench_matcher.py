@@ -0,0 +1,86 @@
+"""Compare the old linear COMMAND_MAP scan with the compiled matcher.
+
+    python benchmarks/bench_matcher.py --commands 50,500,5000 --utterances 2000
+
+Builds a synthetic command set of 1-4 word phrases, then times both
+approaches on utterances that contain a phrase (hits) and ones that do not
+(misses). Misses with fuzzy matching on also pay for the spelling
+correction pass, which is cached per word after the first time.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_matcher import CommandMatcher  # noqa: E402
+
+WORDS = [f"w{i:04d}" for i in range(3000)]
+FILLER = ["please", "could", "you", "now", "edith", "hey", "the", "for"]
+
+
+def build_commands(count, rng):
+    commands = {}
+    while len(commands) < count:
+        phrase = " ".join(rng.sample(WORDS, rng.randint(1, 4)))
+        commands[phrase] = len(commands)
+    return commands
+
+
+def build_utterances(commands, count, rng):
+    phrases = list(commands)
+    hits, misses = [], []
+    for _ in range(count):
+        prefix = " ".join(rng.sample(FILLER, 2))
+        hits.append(f"{prefix} {rng.choice(phrases)} {rng.choice(FILLER)}")
+        misses.append(" ".join(rng.sample(FILLER, 5)))
+    return hits, misses
+
+
+def linear_scan(commands, text):
+    # main.handle_command before the matcher
+    for keyword, handler in commands.items():
+        if keyword in text:
+            return handler
+    return None
+
+
+def time_per_call(fn, utterances):
+    started = time.perf_counter()
+    for text in utterances:
+        fn(text)
+    return (time.perf_counter() - started) / len(utterances) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", default="50,500,5000",
+                        help="comma-separated command set sizes")
+    parser.add_argument("--utterances", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'commands':>8} {'build ms':>9} {'scan hit':>10} {'trie hit':>10}"
+          f" {'scan miss':>10} {'trie miss':>10} {'fuzzy miss':>11}   (us/call)")
+    for size in [int(n) for n in args.commands.split(",")]:
+        rng = random.Random(args.seed)
+        commands = build_commands(size, rng)
+        hits, misses = build_utterances(commands, args.utterances, rng)
+
+        started = time.perf_counter()
+        exact = CommandMatcher(commands, fuzzy=False)
+        build_ms = (time.perf_counter() - started) * 1000
+        fuzzy = CommandMatcher(commands)
+
+        print(f"{size:>8} {build_ms:>9.1f}"
+              f" {time_per_call(lambda t: linear_scan(commands, t), hits):>10.2f}"
+              f" {time_per_call(exact.match, hits):>10.2f}"
+              f" {time_per_call(lambda t: linear_scan(commands, t), misses):>10.2f}"
+              f" {time_per_call(exact.match, misses):>10.2f}"
+              f" {time_per_call(fuzzy.match, misses):>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Report import time per module at assistant start-up.
+
+    python benchmarks/bench_startup.py --top 15
+
+Runs ``python -X importtime`` in a fresh interpreter twice: once importing
+``main`` as start-up does now, and once also loading every registered
+command, which is roughly what the old eager ``commands.py`` cost before
+Edith could greet. Modules that are not installed are skipped.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY = "import main"
+EAGER = """
+import main, registry
+for command in registry.COMMANDS:
+    try:
+        command.load()
+    except ImportError as e:
+        print(f"skipped {command.name}: {e}")
+"""
+
+
+def import_times(code):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if result.returncode:
+        sys.exit(result.stderr.strip().splitlines()[-1])
+    if result.stdout.strip():
+        print(result.stdout.strip())
+
+    # Lines look like "import time:  self [us] | cumulative | name", with
+    # the name indented two spaces per nesting level. Keep top-level
+    # imports and the modules they import directly.
+    modules = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        ms = int(cumulative) / 1000
+        if level == 0:
+            total += ms
+        if level <= 1 and name.strip() != "main":
+            modules[name.strip()] = ms
+    return total, modules
+
+
+def report(label, times, top):
+    total, modules = times
+    print(f"\n{label}: {total:.0f} ms of imports")
+    for name, ms in sorted(modules.items(), key=lambda m: -m[1])[:top]:
+        print(f"  {ms:9.1f} ms  {name}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    lazy = report("start-up (lazy commands)", import_times(LAZY), args.top)
+    eager = report("every command loaded", import_times(EAGER), args.top)
+    print(f"\ndeferred until first use: {eager - lazy:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare speech start-up latency: a new pyttsx3 engine per sentence, the
+persistent Speaker in utils.py, and the same Speaker playing a pre-rendered
+phrase.
+
+    python benchmarks/bench_tts.py --sentences 5
+
+Latency is measured from the speak call to the engine's
+``started-utterance`` event, or until playback of a cached phrase starts,
+i.e. until Edith actually starts talking.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyttsx3  # noqa: E402
+from phrase_cache import PhraseCache  # noqa: E402
+from utils import Speaker  # noqa: E402
+
+SENTENCE = "Opening YouTube"
+
+
+def per_call_engine(count):
+    # What utils.speak used to do for every sentence
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        first_word = []
+        engine = pyttsx3.init()
+        engine.connect("started-utterance",
+                       lambda name: first_word.append(time.perf_counter()))
+        voices = engine.getProperty("voices")
+        engine.setProperty("voice", voices[min(1, len(voices) - 1)].id)
+        engine.setProperty("rate", 150)
+        engine.say(SENTENCE)
+        engine.runAndWait()
+        engine.stop()
+        del engine
+        timings.append((first_word[0] if first_word else time.perf_counter())
+                       - started)
+    return timings
+
+
+def persistent_engine(count):
+    speaker = Speaker()
+    speaker.phrases.enabled = False
+    started = time.perf_counter()
+    speaker.wait_ready()
+    print(f"persistent engine start-up: {time.perf_counter() - started:.3f} s"
+          " (paid once, off the caller's thread)")
+    for _ in range(count):
+        speaker.say(SENTENCE, block=True)
+    return speaker.latencies
+
+
+def cached_phrase(count):
+    speaker = Speaker()
+    speaker.phrases = PhraseCache(tempfile.mkdtemp())
+    speaker.wait_ready()
+    started = time.perf_counter()
+    while speaker.phrases.waiting():
+        time.sleep(0.05)
+    print(f"pre-rendering {speaker.phrases.stats()['in_memory']} phrases:"
+          f" {time.perf_counter() - started:.3f} s (while idle)")
+    for _ in range(count):
+        speaker.say(SENTENCE, block=True)
+    return speaker.latencies
+
+
+def show(label, timings):
+    print(f"{label:<18} mean {statistics.mean(timings) * 1000:8.1f} ms"
+          f"   median {statistics.median(timings) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=5)
+    args = parser.parse_args()
+
+    show("engine per call", per_call_engine(args.sentences))
+    show("persistent engine", persistent_engine(args.sentences))
+    show("cached phrase", cached_phrase(args.sentences))
+
+
+if __name__ == "__main__":
+    main()
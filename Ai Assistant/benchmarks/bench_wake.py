@@ -0,0 +1,124 @@
+"""Measure what the listening loop costs while nobody is talking to Edith.
+
+    python benchmarks/bench_wake.py --minutes 10 [--wav room.wav] [--wake-model PATH]
+
+Plays audio through the real MicListener faster than real time: either a
+recording (16 kHz mono, looped) or a synthetic room with background noise
+and a burst of chatter every 20 seconds. Reports, per hour of audio:
+
+- upstream calls with the old loop (a 5 s chunk sent every 5 s),
+- utterances the energy detector passes on, and the listener's CPU time,
+- with --wake-model, how many of those the wake word spotter lets through
+  and what spotting costs.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_capture import MicListener, SAMPLE_RATE  # noqa: E402
+
+OLD_CHUNK_SECONDS = 5
+
+
+def synthetic_room(seconds, rng):
+    samples = rng.normal(0, 80, seconds * SAMPLE_RATE)
+    t = np.arange(int(1.5 * SAMPLE_RATE)) / SAMPLE_RATE
+    chatter = 3000 * np.sin(2 * np.pi * 180 * t) * np.sin(np.pi * t / 1.5)
+    for start in range(5, seconds - 2, 20):
+        offset = start * SAMPLE_RATE
+        samples[offset:offset + len(chatter)] += chatter
+    return samples.clip(-32768, 32767).astype(np.int16)
+
+
+def load_wav(path, seconds):
+    with wave.open(path) as f:
+        if (f.getframerate(), f.getnchannels(), f.getsampwidth()) != \
+                (SAMPLE_RATE, 1, 2):
+            sys.exit(f"{path} must be 16 kHz mono 16-bit")
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    repeats = -(-seconds * SAMPLE_RATE // len(samples))
+    return np.tile(samples, repeats)[:seconds * SAMPLE_RATE]
+
+
+class PlaybackListener(MicListener):
+    # Feeds a recording into the ring buffer instead of opening a stream
+
+    def __init__(self, samples, speed):
+        super().__init__()
+        self.samples = samples
+        self.speed = speed
+        self.done = threading.Event()
+
+    def start(self):
+        if self.done.is_set() or getattr(self, "_feeder", None):
+            return
+        self._feeder = threading.Thread(target=self._feed, daemon=True)
+        self._feeder.start()
+
+    def _feed(self):
+        delay = self.frame / self.samplerate / self.speed
+        for offset in range(0, len(self.samples), self.frame):
+            self.ring.write(self.samples[offset:offset + self.frame])
+            time.sleep(delay)
+        self.done.set()
+        self.ring.write(np.zeros(self.frame, dtype=np.int16))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, default=10)
+    parser.add_argument("--speed", type=float, default=50,
+                        help="times faster than real time")
+    parser.add_argument("--wav", help="16 kHz mono recording to loop")
+    parser.add_argument("--wake-model", help="Vosk model for the spotter")
+    args = parser.parse_args()
+
+    seconds = args.minutes * 60
+    samples = (load_wav(args.wav, seconds) if args.wav
+               else synthetic_room(seconds, np.random.default_rng(1)))
+    listener = PlaybackListener(samples, args.speed)
+
+    gate = None
+    if args.wake_model:
+        from wake_word import WakeWordGate, model_loader
+        gate = WakeWordGate(model_loader(args.wake_model))
+        gate.warm_up()
+
+    utterances = 0
+    admitted = 0
+    listen_cpu = 0.0
+    spot_cpu = 0.0
+    listener.start()
+    while not listener.done.is_set():
+        started = time.thread_time()
+        audio = listener.listen(start_timeout=5)
+        listen_cpu += time.thread_time() - started
+        if audio is None:
+            continue
+        utterances += 1
+        if gate is not None:
+            started = time.thread_time()
+            if gate.admit(audio) is not None:
+                admitted += 1
+            spot_cpu += time.thread_time() - started
+
+    per_hour = 3600 / seconds
+    print(f"{args.minutes} min of audio at {args.speed:g}x, per hour:")
+    print(f"  old loop (5 s chunks):  {3600 // OLD_CHUNK_SECONDS:6d} upstream calls")
+    print(f"  energy detector:        {utterances * per_hour:6.0f} utterances,"
+          f" {listen_cpu * per_hour:.1f} s CPU"
+          f" ({listen_cpu / seconds * 100:.2f}% of a core)")
+    if gate is not None:
+        print(f"  + wake word spotter:    {admitted * per_hour:6.0f} upstream calls,"
+              f" {spot_cpu * per_hour:.1f} s CPU spotting")
+
+
+if __name__ == "__main__":
+    main()
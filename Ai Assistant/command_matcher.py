@@ -0,0 +1,99 @@
+import difflib
+import functools
+import re
+from collections import namedtuple
+
+# Words dropped from the edges of a command's argument, so "search for
+# cats" searches for "cats"
+FILLER = {"for", "about", "on", "of", "the", "a", "an", "please", "me"}
+
+Match = namedtuple("Match", "phrase handler start end argument fuzzy")
+
+
+def normalize(text):
+    return [token.replace("'", "") for token in
+            re.findall(r"[a-z0-9']+", text.lower())]
+
+
+def strip_filler(tokens):
+    start, end = 0, len(tokens)
+    while start < end and tokens[start] in FILLER:
+        start += 1
+    while end > start and tokens[end - 1] in FILLER:
+        end -= 1
+    return tokens[start:end]
+
+
+class CommandMatcher:
+    # Token trie over every command phrase. A lookup walks the trie from
+    # each word of the utterance, so the cost depends on the utterance and
+    # the longest phrase, not on how many commands there are.
+    #
+    # When several phrases match, the most specific wins: more words, then
+    # the one spoken first ("play video" beats "play", and "play despacito
+    # on youtube" plays rather than opens YouTube).
+    #
+    # Spelling correction only ever completes a phrase of two or more
+    # words. A lone corrected word is too weak a signal: it turned "exist"
+    # into "exit" and "cancer" into "cancel".
+
+    def __init__(self, commands, fuzzy=True, cutoff=0.8):
+        self.fuzzy = fuzzy
+        self.cutoff = cutoff
+        self._root = {}
+        vocabulary = set()
+        for order, (phrase, handler) in enumerate(commands.items()):
+            tokens = normalize(phrase)
+            vocabulary.update(tokens)
+            node = self._root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            # None never collides with a word, so it marks a phrase end
+            node[None] = (phrase, handler, order)
+        self._vocabulary = sorted(vocabulary)
+        self._vocabulary_set = vocabulary
+        self._correct = functools.lru_cache(maxsize=4096)(self._closest)
+
+    def _closest(self, token):
+        # Recognition slips like "wikipedea" or "screenshots"; short words
+        # are left alone because they are too easy to confuse
+        if token in self._vocabulary_set or len(token) < 4:
+            return token
+        close = difflib.get_close_matches(token, self._vocabulary, n=1,
+                                          cutoff=self.cutoff)
+        return close[0] if close else token
+
+    def _find(self, tokens, min_words=1):
+        best = None
+        best_rank = None
+        for start in range(len(tokens)):
+            node = self._root
+            end = start
+            while end < len(tokens) and tokens[end] in node:
+                node = node[tokens[end]]
+                end += 1
+                if None in node and end - start >= min_words:
+                    phrase, handler, order = node[None]
+                    rank = (end - start, -start, -order)
+                    if best_rank is None or rank > best_rank:
+                        best_rank = rank
+                        best = (phrase, handler, start, end)
+        return best
+
+    def match(self, text):
+        tokens = normalize(text)
+        found = self._find(tokens)
+        fuzzy = False
+        if found is None and self.fuzzy:
+            corrected = [self._correct(token) for token in tokens]
+            if corrected != tokens:
+                found = self._find(corrected, min_words=2)
+                fuzzy = True
+        if found is None:
+            return None
+
+        phrase, handler, start, end = found
+        # The argument is what follows the phrase, or what precedes it
+        # ("python wikipedia")
+        argument = strip_filler(tokens[end:]) or strip_filler(tokens[:start])
+        return Match(phrase, handler, start, end, " ".join(argument), fuzzy)
@@ -1,25 +1,19 @@
+# Command handlers. Heavy third-party modules are imported inside the
+# handlers that use them, so loading this file costs next to nothing; the
+# phrases, dependencies and pre-warming live in registry.py.
 import os
 import datetime
 import webbrowser
-import pyautogui
-import pywhatkit
-import wikipedia
-import pyjokes
-import psutil
-import requests
-from utils import speak
-import speech_recognition as sr
-import sounddevice as sd
-import wave
-import tempfile
+from utils import speak, stop_speaking
+from executor import executor
+from recognizers import hear
+from answer_cache import answer_cache
+from command_matcher import FILLER
 
 def listen_for_note():
-    recognizer = sr.Recognizer()
     try:
-        with sr.Microphone() as source:
-             print("Listening for note...")
-             audio = recognizer.listen(source, timeout=5)
-             return recognizer.recognize_google(audio)
+        print("Listening for note...")
+        return hear(start_timeout=5)
     except Exception:
         return None
 
@@ -42,6 +36,7 @@ def cmd_portfolio(text):
     webbrowser.open("https://www.abdheshsah.com.np")
 
 def cmd_joke(text):
+    import pyjokes
     joke = pyjokes.get_joke(language="en", category="neutral")
     speak(joke)
 
@@ -64,28 +59,31 @@ def cmd_play_video(text):
     else:
         speak("Could not find a Videos folder")
 
-def cmd_wikipedia(text):
+def cmd_wikipedia(query):
+    import wikipedia
     speak("Searching Wikipedia...")
-    query = text.replace("wikipedia", "").strip()
     try:
-        results = wikipedia.summary(query, sentences=2)
+        results = answer_cache.get(
+            "wikipedia", query,
+            lambda: wikipedia.summary(query, sentences=2))
         speak("According to Wikipedia")
         print(results)
         speak(results)
     except Exception:
         speak("I couldn't find any information on Wikipedia about that.")
 
-def cmd_search(text):
-    query = text.replace("search", "").strip()
+def cmd_search(query):
+    import pywhatkit
     speak(f"Searching for {query}")
     pywhatkit.search(query)
 
-def cmd_play_song(text):
-    song = text.replace("play", "").strip()
+def cmd_play_song(song):
+    import pywhatkit
     speak(f"Playing {song}")
     pywhatkit.playonyt(song)
 
 def cmd_screenshot(text):
+    import pyautogui
     img = pyautogui.screenshot()
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     filename = f"screenshot_{timestamp}.png"
@@ -101,34 +99,41 @@ def cmd_open_calculator(text):
     os.system("calc.exe")
 
 def cmd_battery(text):
+    import psutil
     battery = psutil.sensors_battery()
     percentage = battery.percent
     speak(f"System is at {percentage} percent battery")
 
 def cmd_system_health(text):
+    import psutil
     cpu = psutil.cpu_percent()
     ram = psutil.virtual_memory().percent
     speak(f"CPU usage is at {cpu} percent and RAM usage is at {ram} percent")
 
 def cmd_check_disk(text):
+    import psutil
     disk = psutil.disk_usage('C:')
     total = round(disk.total / (1024**3), 2)
     free = round(disk.free / (1024**3), 2)
     speak(f"In C drive, total space is {total} gigabytes and free space is {free} gigabytes")
 
 def cmd_volume_up(text):
+    import pyautogui
     pyautogui.press("volumeup")
     speak("Increasing volume")
 
 def cmd_volume_down(text):
+    import pyautogui
     pyautogui.press("volumedown")
     speak("Decreasing volume")
 
 def cmd_mute(text):
+    import pyautogui
     pyautogui.press("volumemute")
     speak("Toggling mute")
 
 def cmd_weather(text):
+    import pywhatkit
     speak("Searching for weather info")
     pywhatkit.search("current weather")
 
@@ -137,8 +142,16 @@ def cmd_date(text):
     speak(f"Today is {date}")
 
 def cmd_ip(text):
+    import requests
+
+    def fetch():
+        # An error page must not be cached (and spoken) as the address
+        response = requests.get('https://api.ipify.org', timeout=5)
+        response.raise_for_status()
+        return response.text.strip()
+
     try:
-        ip = requests.get('https://api.ipify.org').text
+        ip = answer_cache.get("ip", "", fetch)
         speak(f"Your public IP address is {ip}")
     except Exception:
         speak("I'm sorry, I couldn't fetch your IP address right now.")
@@ -154,69 +167,85 @@ def cmd_close_calculator(text):
 def cmd_make_note(text):
     
     speak("What should the note say?")
-    
-    r = sr.Recognizer()
-    try:
-        with sr.Microphone() as source:
-            print("Listening for note...")
-            audio = r.listen(source, timeout=5)
-        note_content = r.recognize_google(audio)
-    except:
-        note_content = None
+    note_content = listen_for_note()
 
     if note_content:
-        with open("notes.txt", "a") as f:
-            f.write(f"{datetime.datetime.now()}: {note_content}\n")
+        from notes_store import get_notes
+        get_notes().add(note_content)
         speak("I've saved your note.")
     else:
         speak("I couldn't hear the note content.")
 
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+                "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+                "twenty": 20}
+DEFAULT_NOTES = 5
+
+# Words that say which notes, not what they are about
+NOTES_FILLER = FILLER | {"note", "notes", "my", "read", "more", "last",
+                         "latest", "older", "to", "in", "with", "and"}
+
+def notes_request(text):
+    # "last five notes about the meeting" -> (5, "meeting")
+    words = text.lower().split()
+    count = DEFAULT_NOTES
+    if words and (words[0].isdigit() or words[0] in NUMBER_WORDS):
+        count = int(words[0]) if words[0].isdigit() else NUMBER_WORDS[words[0]]
+        words = words[1:]
+    words = [w for w in words if w not in NOTES_FILLER]
+    return max(count, 1), " ".join(words)
+
+# (topic, id of the last note read) for "read more notes"
+_older_notes = None
+
+def _read_notes(count, topic, before, intro):
+    # Speak up to count notes older than before; returns how many were read
+    global _older_notes
+    from notes_store import get_notes
+    _older_notes = None
+    read = 0
+    last_id = None
+    # Ask for one extra to know whether older notes are left; each note is
+    # spoken as soon as its page is read
+    for note_id, created, body in get_notes().latest(count + 1, topic, before):
+        if read == count:
+            _older_notes = (topic, last_id)
+            speak("There are older notes too. Say read more notes to hear them.")
+            break
+        if read == 0:
+            speak(intro)
+        when = f"{created:%B} {created.day} at {created:%I:%M %p}"
+        print(f"{created}: {body}")
+        speak(f"{when}: {body}")
+        last_id = note_id
+        read += 1
+    return read
+
 def cmd_read_notes(text):
-    if os.path.exists("notes.txt"):
-        with open("notes.txt", "r") as f:
-            content = f.read()
-        if content:
-            speak("Here are your notes.")
-            print(content)
-            speak(content)
-        else:
-            speak("Your notes file is empty.")
-    else:
-        speak("You don't have any notes saved.")
+    count, topic = notes_request(text)
+    intro = (f"Here are your notes about {topic}." if topic
+             else "Here are your latest notes.")
+    if not _read_notes(count, topic, None, intro):
+        speak(f"I couldn't find any notes about {topic}." if topic
+              else "You don't have any notes saved.")
+
+def cmd_read_more_notes(text):
+    # Carries on from where the last "read notes" stopped
+    if _older_notes is None:
+        speak("There are no more notes to read.")
+        return
+    count, _ = notes_request(text)
+    topic, before = _older_notes
+    if not _read_notes(count, topic, before, "Here are older notes."):
+        speak("There are no more notes to read.")
+
+def cmd_cancel(text):
+    stop_speaking()
+    count = executor.cancel_all()
+    speak("Cancelled" if count else "Nothing to cancel")
 
 def cmd_exit(text):
-    speak("Goodbye")
+    executor.shutdown()
+    stop_speaking()
+    speak("Goodbye", block=True)
     exit()
-
-
-COMMAND_MAP = {
-    "your name": cmd_name,
-    "old are you": cmd_age,
-    "now time": cmd_time,
-    "youtube": cmd_youtube,
-    "portfolio": cmd_portfolio,
-    "joke": cmd_joke,
-    "play video": cmd_play_video,
-    "wikipedia": cmd_wikipedia,
-    "search": cmd_search,
-    "play": cmd_play_song,
-    "screenshot": cmd_screenshot,
-    "open notepad": cmd_open_notepad,
-    "open calculator": cmd_open_calculator,
-    "battery": cmd_battery,
-    "system health": cmd_system_health,
-    "cpu usage": cmd_system_health,
-    "check disk": cmd_check_disk,
-    "volume up": cmd_volume_up,
-    "volume down": cmd_volume_down,
-    "mute": cmd_mute,
-    "weather": cmd_weather,
-    "date today": cmd_date,
-    "ip address": cmd_ip,
-    "close notepad": cmd_close_notepad,
-    "close calculator": cmd_close_calculator,
-    "make a note": cmd_make_note,
-    "read notes": cmd_read_notes,
-    "exit": cmd_exit,
-    "stop": cmd_exit
-}
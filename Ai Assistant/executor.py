@@ -0,0 +1,106 @@
+import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import speaker, speech_sink
+
+DEFAULT_TIMEOUT = 20
+WORKERS = 4
+
+
+class CommandExecutor:
+    # Runs slow command handlers on a thread pool, scheduled from an asyncio
+    # loop of its own, so the main loop can go straight back to listening.
+    #
+    # Speech from a handler is spoken in the order the commands were given:
+    # the oldest unfinished command talks straight away, later ones are
+    # held until everything before them is done.
+
+    def __init__(self, workers=WORKERS, default_timeout=DEFAULT_TIMEOUT):
+        self.default_timeout = default_timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix="command")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._head = 0
+        self._pending = set()
+        self._finished = set()
+        self._held = {}
+        self._abandoned = set()
+
+    def submit(self, handler, argument, timeout=None):
+        with self._lock:
+            seq = next(self._sequence)
+            self._pending.add(seq)
+            self._held[seq] = []
+        return asyncio.run_coroutine_threadsafe(
+            self._run(seq, handler, argument,
+                      timeout or self.default_timeout),
+            self._loop
+        )
+
+    async def _run(self, seq, handler, argument, timeout):
+        def call():
+            if seq in self._abandoned:
+                return
+            with speech_sink(lambda text, block: self._output(seq, text)):
+                handler(argument)
+
+        try:
+            await asyncio.wait_for(
+                self._loop.run_in_executor(self._pool, call), timeout)
+        except asyncio.TimeoutError:
+            # The thread can't be stopped, but whatever it says later is
+            # dropped so it can't talk over newer answers
+            self._output(seq, "Sorry, that is taking too long.")
+            with self._lock:
+                self._abandoned.add(seq)
+        except Exception as e:
+            print(f"Command error: {e}")
+            self._output(seq, "Sorry, something went wrong.")
+        finally:
+            self._finish(seq)
+
+    def _output(self, seq, text):
+        # Speaking under the lock keeps held and live speech in order
+        with self._lock:
+            if seq in self._abandoned:
+                return
+            if seq == self._head:
+                speaker.say(text)
+            else:
+                self._held[seq].append(text)
+
+    def _finish(self, seq):
+        with self._lock:
+            self._pending.discard(seq)
+            self._finished.add(seq)
+            while self._head in self._finished:
+                self._finished.discard(self._head)
+                self._held.pop(self._head, None)
+                self._head += 1
+                if self._head not in self._abandoned:
+                    for text in self._held.get(self._head, []):
+                        speaker.say(text)
+                if self._head in self._held:
+                    self._held[self._head] = []
+
+    def cancel_all(self):
+        # Commands still waiting for a worker are skipped; ones already
+        # running finish silently
+        with self._lock:
+            cancelled = self._pending - self._abandoned
+            self._abandoned |= cancelled
+        return len(cancelled)
+
+    def shutdown(self):
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+executor = CommandExecutor()
@@ -1,39 +1,26 @@
 import speech_recognition as sr
-import sounddevice as sd
-import wave
-import tempfile
-import os
+import atexit
+import threading
 import datetime
-from utils import speak
-from commands import COMMAND_MAP
+from recognizers import hear, listening_stats, recognizer, wake_gate
+from utils import speak, wait_until_done
+from command_matcher import CommandMatcher
+from executor import executor
+from registry import COMMAND_MAP, INTERRUPT_PHRASES, prewarm
+from answer_cache import answer_cache
+
+matcher = CommandMatcher(COMMAND_MAP)
+
 
 def listen():
-    recognizer = sr.Recognizer()
-    samplerate = 16000
-    duration = 5
-    channels = 1
-    
-    print("Listening....")
+    # While Edith talks only "cancel", "stop" and the like are listened for
+    if wait_until_done(0):
+        print("Listening....")
     try:
-        audio_data = sd.rec(int(samplerate * duration), samplerate=samplerate, 
-                           channels=channels, dtype='int16')
-        sd.wait()
-        print("Recognizing...")
-        
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            temp_path = tmp_file.name
-            with wave.open(temp_path, 'wb') as wf:
-                wf.setnchannels(channels)
-                wf.setsampwidth(2)  
-                wf.setframerate(samplerate)
-                wf.writeframes(audio_data.tobytes())
-        
-        with sr.AudioFile(temp_path) as source:
-            audio = recognizer.record(source)
-        
-        os.unlink(temp_path)
-        
-        data = recognizer.recognize_google(audio)
+        data = hear(wake=True, on_partial=lambda text: print(f"  ...{text}"),
+                    interrupts=INTERRUPT_PHRASES)
+        if data is None:
+            return None
         print(data)
         return data.lower()
     except sr.UnknownValueError:
@@ -59,16 +46,29 @@ def wish_me():
 
 
 def handle_command(data1):
-    # Iterate through command mappings
-    # We check if the keyword is IN the spoken text (data1)
-    for keyword, handler in COMMAND_MAP.items():
-        if keyword in data1:
-            handler(data1)
-            return
+    # The most specific phrase wins; its handler gets the rest of the
+    # sentence (e.g. the search query) as its argument
+    match = matcher.match(data1)
+    if not match:
+        return
+    command = match.handler
+    if command.inline:
+        command(match.argument)
+    else:
+        # Slow work runs in the background while Edith keeps listening
+        executor.submit(command, match.argument, timeout=command.timeout)
 
 
 if __name__ == "__main__":
+    # Load an offline model while Edith greets
+    recognizer.warm_up_in_background()
+    if wake_gate is not None:
+        threading.Thread(target=wake_gate.warm_up, daemon=True).start()
+    atexit.register(lambda: print(f"Recognition latency: {recognizer.stats()}"))
+    atexit.register(lambda: print(f"Answer cache: {answer_cache.stats()}"))
+    atexit.register(lambda: print(f"Listening: {listening_stats()}"))
     wish_me()
+    prewarm()
     while True:
         data1 = listen()
         if data1:
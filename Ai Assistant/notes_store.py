@@ -0,0 +1,143 @@
+import datetime
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+NOTES_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "notes.db")
+# Where cmd_make_note used to append; imported once on first use
+LEGACY_FILE = "notes.txt"
+PAGE_SIZE = 5
+
+LEGACY_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?): (.*)$")
+
+
+class NotesStore:
+    # Notes in SQLite with a full-text index. Every read walks the primary
+    # key (or the index) newest first and stops after one page, so reading
+    # costs the same with ten notes or ten thousand.
+
+    def __init__(self, path=NOTES_DB, legacy_file=LEGACY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS notes ("
+                       "id INTEGER PRIMARY KEY, created TEXT NOT NULL, "
+                       "body TEXT NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta ("
+                       "key TEXT PRIMARY KEY, value TEXT)")
+            try:
+                db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts "
+                           "USING fts5(body, content='notes', "
+                           "content_rowid='id')")
+                db.execute("CREATE TRIGGER IF NOT EXISTS notes_ai AFTER "
+                           "INSERT ON notes BEGIN INSERT INTO notes_fts"
+                           "(rowid, body) VALUES (new.id, new.body); END")
+                self.full_text = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5; search falls back to LIKE
+                self.full_text = False
+        self._import_legacy(legacy_file)
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager commits but never closes
+        with closing(sqlite3.connect(self.path, timeout=5)) as db, db:
+            yield db
+
+    def _import_legacy(self, legacy_file):
+        if not os.path.exists(legacy_file):
+            return
+        with self._lock, self._connect() as db:
+            if db.execute("SELECT 1 FROM meta WHERE key = 'imported'"
+                          ).fetchone():
+                return
+            notes = []
+            with open(legacy_file) as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    found = LEGACY_LINE.match(line)
+                    if found:
+                        notes.append([found.group(1), found.group(2)])
+                    elif notes and line:
+                        # A note that ran over several lines
+                        notes[-1][1] += "\n" + line
+                    elif line:
+                        notes.append([datetime.datetime.now().isoformat(" "),
+                                      line])
+            db.executemany("INSERT INTO notes (created, body) VALUES (?, ?)",
+                           notes)
+            db.execute("INSERT INTO meta VALUES ('imported', ?)",
+                       (os.path.abspath(legacy_file),))
+        print(f"Imported {len(notes)} notes from {legacy_file}")
+
+    def add(self, body):
+        with self._lock, self._connect() as db:
+            db.execute("INSERT INTO notes (created, body) VALUES (?, ?)",
+                       (datetime.datetime.now().isoformat(" "), body))
+
+    def latest(self, limit, query=None, before=None):
+        # Yield up to limit notes older than the id before (or the newest),
+        # newest first, as (id, created, body). Rows are fetched a page at
+        # a time, so the caller can start speaking the first note before
+        # the rest are read.
+        while limit > 0:
+            size = min(limit, PAGE_SIZE)
+            page = self._page(size, query, before)
+            for note_id, created, body in page:
+                yield note_id, datetime.datetime.fromisoformat(created), body
+            if len(page) < size:
+                return
+            limit -= len(page)
+            before = page[-1][0]
+
+    def _page(self, size, query, before):
+        where, params = [], []
+        if before is not None:
+            where.append("rowid < ?")
+            params.append(before)
+        match = fts_query(query or "")
+        if match and self.full_text:
+            # FTS5 walks its matches in rowid order, so newest-first with
+            # a LIMIT stops early instead of sorting every match
+            where.append("notes_fts MATCH ?")
+            params.append(match)
+            source = "notes_fts"
+        else:
+            # Without FTS5 this is a scan, but it still stops at a page
+            for word in (query or "").split():
+                where.append("body LIKE ?")
+                params.append(f"%{word}%")
+            source = "notes"
+        sql = f"SELECT rowid FROM {source}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY rowid DESC LIMIT ?"
+        params.append(size)
+        with self._connect() as db:
+            return db.execute(
+                f"SELECT id, created, body FROM notes WHERE id IN ({sql}) "
+                "ORDER BY id DESC", params).fetchall()
+
+
+def fts_query(text):
+    # Every word must appear, as a prefix ("grocer" finds "groceries");
+    # quoting keeps FTS5 operators in speech from being parsed. Empty when
+    # there are no words, since MATCH '' is an error.
+    words = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{word}"*' for word in words)
+
+
+_notes = None
+_notes_lock = threading.Lock()
+
+
+def get_notes():
+    # Opened on first use, so the notes.txt import doesn't slow start-up
+    global _notes
+    with _notes_lock:
+        if _notes is None:
+            _notes = NotesStore()
+        return _notes
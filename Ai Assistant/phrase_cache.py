@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import wave
+from collections import OrderedDict
+import numpy as np
+import sounddevice as sd
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "speech_cache")
+MEMORY_SIZE = 64
+MAX_CHARS = 60            # longer text is rarely said twice word for word
+MIN_USES = 2              # unknown text is rendered once it repeats
+
+# Fixed phrases rendered ahead of time, while Edith is otherwise idle
+KNOWN_PHRASES = [
+    "Good Morning!", "Good Afternoon!", "Good Evening!",
+    "I am Edith. How can I help you today?", "Yes?", "Goodbye",
+    "Opening YouTube", "Opening your portfolio", "Increasing volume",
+    "Decreasing volume", "Toggling mute", "Searching Wikipedia...",
+    "According to Wikipedia", "What should the note say?",
+    "I've saved your note.", "Cancelled", "Nothing to cancel",
+    "Sorry, that is taking too long.", "Sorry, something went wrong.",
+]
+
+
+class PhraseCache:
+    # Audio for phrases Edith says often, rendered once with the engine's
+    # save_to_file and played straight from memory. The files on disk are
+    # named after the voice settings, so changing voice or rate misses
+    # every old entry, and set_voice() deletes them.
+    #
+    # Everything except play() and stop() runs on the speech worker thread,
+    # which owns the engine.
+
+    def __init__(self, directory=CACHE_DIR, memory_size=MEMORY_SIZE):
+        self.directory = directory
+        self.memory_size = memory_size
+        self.voice = None
+        self._memory = OrderedDict()
+        self._uses = {}
+        self._todo = list(KNOWN_PHRASES)
+        self._failed = set()
+        self._playing = threading.Event()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def set_voice(self, signature):
+        voice = hashlib.sha1(signature.encode()).hexdigest()[:10]
+        if voice == self.voice:
+            return
+        self.voice = voice
+        self._memory.clear()
+        self._failed.clear()
+        self._todo = list(KNOWN_PHRASES) + [
+            text for text, uses in self._uses.items()
+            if uses >= MIN_USES and text not in KNOWN_PHRASES]
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if not name.startswith(voice):
+                os.remove(os.path.join(self.directory, name))
+
+    def _path(self, text):
+        name = hashlib.sha1(text.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{self.voice}-{name}.wav")
+
+    def get(self, text):
+        # The rendered clip as (samples, samplerate), or None
+        if not self.enabled or self.voice is None:
+            return None
+        clip = self._memory.get(text)
+        if clip is None and os.path.exists(self._path(text)):
+            clip = self._load(self._path(text))
+            if clip is not None:
+                self._remember(text, clip)
+        if clip is None:
+            self.misses += 1
+            return None
+        self._memory.move_to_end(text)
+        self.hits += 1
+        return clip
+
+    def _load(self, path):
+        try:
+            with wave.open(path) as f:
+                if f.getsampwidth() != 2:
+                    return None
+                samples = np.frombuffer(f.readframes(f.getnframes()),
+                                        dtype=np.int16)
+                return samples.reshape(-1, f.getnchannels()), f.getframerate()
+        except (OSError, wave.Error, EOFError):
+            # Some drivers write AIFF or nothing at all; speak those live
+            return None
+
+    def _remember(self, text, clip):
+        self._memory[text] = clip
+        self._memory.move_to_end(text)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def note_use(self, text):
+        # Queue text for rendering once it has been said often enough
+        if len(text) > MAX_CHARS or text in self._failed:
+            return
+        self._uses[text] = self._uses.get(text, 0) + 1
+        if self._uses[text] == MIN_USES and text not in self._memory:
+            self._todo.append(text)
+
+    def waiting(self):
+        return bool(self._todo) and self.enabled
+
+    def render_next(self, engine):
+        # Render one queued phrase; False when there is nothing left to do
+        while self._todo and self.enabled and self.voice is not None:
+            text = self._todo.pop(0)
+            path = self._path(text)
+            if text in self._memory or os.path.exists(path):
+                continue
+            partial = path + ".part"
+            try:
+                engine.save_to_file(text, partial)
+                engine.runAndWait()
+                os.replace(partial, path)
+            except Exception as e:
+                print(f"Could not pre-render {text!r}: {e}")
+                self._failed.add(text)
+                continue
+            clip = self._load(path)
+            if clip is None:
+                os.remove(path)
+                self._failed.add(text)
+                continue
+            self._remember(text, clip)
+            return True
+        return False
+
+    def play(self, clip):
+        samples, samplerate = clip
+        self._playing.set()
+        try:
+            sd.play(samples, samplerate, blocking=True)
+        finally:
+            self._playing.clear()
+
+    def stop(self):
+        if self._playing.is_set():
+            sd.stop()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "in_memory": len(self._memory), "waiting": len(self._todo)}
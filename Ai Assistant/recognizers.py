@@ -0,0 +1,233 @@
+import json
+import os
+import re
+import threading
+import time
+import speech_recognition as sr
+from audio_capture import MicListener
+from command_matcher import normalize
+from utils import now_speaking, speak, wait_until_done
+from wake_word import WAKE_MODEL, WAKE_WORD, WakeWordGate, model_loader
+
+# EDITH_RECOGNIZER picks the backend: "google", "vosk" (offline) or
+# "fixture". Unset, vosk is used when a model is configured.
+RECOGNIZER = os.getenv("EDITH_RECOGNIZER", "")
+VOSK_MODEL = os.getenv("EDITH_VOSK_MODEL", "")
+FIXTURE_FILE = os.getenv("EDITH_FIXTURE_FILE", "")
+
+
+class Recognizer:
+    # Backends implement _recognize(); transcribe() adds latency tracking.
+    # Like speech_recognition, they raise sr.UnknownValueError when nothing
+    # was understood and sr.RequestError when the engine itself failed.
+    name = "base"
+    needs_audio = True
+
+    def __init__(self):
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        pass
+
+    def warm_up_in_background(self):
+        def run():
+            try:
+                self.warm_up()
+            except Exception as e:
+                print(f"Recognizer warm-up failed: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def _recognize(self, audio, on_partial):
+        raise NotImplementedError
+
+    def transcribe(self, audio, on_partial=None):
+        started = time.perf_counter()
+        try:
+            return self._recognize(audio, on_partial)
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - started)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {"backend": self.name, "calls": 0}
+        return {
+            "backend": self.name,
+            "calls": len(latencies),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        }
+
+
+class GoogleRecognizer(Recognizer):
+    name = "google"
+
+    def __init__(self):
+        super().__init__()
+        self._recognizer = sr.Recognizer()
+
+    def _recognize(self, audio, on_partial):
+        return self._recognizer.recognize_google(audio)
+
+
+class VoskRecognizer(Recognizer):
+    # Offline and CPU-only. The model takes a few seconds to load, so it is
+    # loaded once (warm_up can do it in the background) and shared.
+    name = "vosk"
+    chunk_bytes = 8000
+
+    def __init__(self, model_path, samplerate=16000):
+        super().__init__()
+        self.model_path = model_path
+        self.samplerate = samplerate
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def warm_up(self):
+        with self._model_lock:
+            if self._model is None:
+                import vosk
+                vosk.SetLogLevel(-1)
+                self._model = vosk.Model(self.model_path)
+        return self._model
+
+    def _recognize(self, audio, on_partial):
+        import vosk
+        try:
+            model = self.warm_up()
+        except Exception as e:
+            raise sr.RequestError(f"could not load Vosk model: {e}")
+
+        decoder = vosk.KaldiRecognizer(model, self.samplerate)
+        data = audio.get_raw_data(convert_rate=self.samplerate,
+                                  convert_width=2)
+        partial = ""
+        for offset in range(0, len(data), self.chunk_bytes):
+            if decoder.AcceptWaveform(data[offset:offset + self.chunk_bytes]):
+                continue
+            if on_partial:
+                text = json.loads(decoder.PartialResult()).get("partial", "")
+                if text and text != partial:
+                    partial = text
+                    on_partial(text)
+
+        text = json.loads(decoder.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class FixtureRecognizer(Recognizer):
+    # Replays transcripts in order, one per line of a file (or a list), so
+    # the assistant can be driven without a microphone. A blank line plays
+    # back as "could not understand"; the session ends after the last one.
+    name = "fixture"
+    needs_audio = False
+
+    def __init__(self, transcripts):
+        super().__init__()
+        if isinstance(transcripts, str):
+            with open(transcripts, encoding="utf-8") as f:
+                transcripts = f.read().splitlines()
+        self._transcripts = list(transcripts)
+
+    def _recognize(self, audio, on_partial):
+        if not self._transcripts:
+            raise SystemExit("Fixture transcripts exhausted")
+        text = self._transcripts.pop(0).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        if on_partial:
+            words = text.split()
+            for i in range(1, len(words)):
+                on_partial(" ".join(words[:i]))
+        return text
+
+
+def create_recognizer(name=RECOGNIZER):
+    if name == "fixture":
+        return FixtureRecognizer(FIXTURE_FILE)
+    if name == "vosk" or (not name and VOSK_MODEL):
+        return VoskRecognizer(VOSK_MODEL or "model")
+    return GoogleRecognizer()
+
+
+def create_wake_gate(recognizer):
+    # The spotter needs a Vosk model: its own small one, or the one
+    # already loaded for recognition. Without either, every utterance
+    # goes to the recognizer as before.
+    if not WAKE_WORD or not recognizer.needs_audio:
+        return None
+    if WAKE_MODEL:
+        return WakeWordGate(model_loader(WAKE_MODEL))
+    if isinstance(recognizer, VoskRecognizer):
+        return WakeWordGate(recognizer.warm_up)
+    print("No wake word model (EDITH_WAKE_MODEL); listening to everything")
+    return None
+
+
+recognizer = create_recognizer()
+microphone = MicListener()
+wake_gate = create_wake_gate(recognizer)
+
+
+def _contains(text, phrase):
+    return re.search(rf"\b{re.escape(phrase)}\b", text) is not None
+
+
+def _interruption(audio, phrases):
+    # The mic also picks up Edith herself, so only one of ``phrases`` that
+    # she isn't saying right now counts; everything else is dropped
+    try:
+        if wake_gate is not None:
+            text = wake_gate.spot_phrases(audio, phrases)
+        else:
+            text = recognizer.transcribe(audio)
+    except (sr.UnknownValueError, sr.RequestError):
+        return None
+    text = " ".join(normalize(text))
+    own = " ".join(normalize(now_speaking() or ""))
+    for phrase in phrases:
+        if _contains(text, phrase) and not _contains(own, phrase):
+            return phrase
+    return None
+
+
+def hear(start_timeout=5, on_partial=None, wake=False, interrupts=()):
+    # Next utterance as text, or None if nobody spoke. With wake=True the
+    # utterance must start with the wake word, and anything else is
+    # dropped without being sent to the recognizer. Recognition errors are
+    # raised for the caller to handle.
+    #
+    # The mic stays open while Edith talks, but then only the phrases in
+    # ``interrupts`` are listened for (no wake word needed), so "cancel"
+    # can cut her off. Without them, hear() waits until she is done.
+    if not interrupts or not recognizer.needs_audio:
+        wait_until_done()
+    audio = None
+    if recognizer.needs_audio:
+        talking = not wait_until_done(0)
+        audio = microphone.listen(start_timeout=start_timeout)
+        if audio is None:
+            return None
+        if talking:
+            return _interruption(audio, interrupts)
+        if wake and wake_gate is not None:
+            audio = wake_gate.admit(audio)
+            if audio is True:
+                speak("Yes?")
+                return None
+            if audio is None:
+                return None
+    return recognizer.transcribe(audio, on_partial)
+
+
+def listening_stats():
+    calls = len(recognizer.latencies)
+    if wake_gate is None:
+        return {"wake_word": None, "upstream_calls": calls}
+    return {"wake_word": wake_gate.keyword, **wake_gate.stats(calls)}
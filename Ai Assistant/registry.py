@@ -0,0 +1,169 @@
+import atexit
+import importlib
+import json
+import os
+import threading
+import time
+
+USAGE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "command_usage.json")
+PREWARM_COUNT = 3
+
+
+class Command:
+    # A registry entry. The handler ("module:function") and its third-party
+    # dependencies are only imported when the command is first used or
+    # pre-warmed, so adding commands doesn't slow down start-up.
+
+    def __init__(self, name, phrases, handler, deps=(), inline=False,
+                 timeout=None, interrupt=False):
+        self.name = name
+        self.phrases = phrases
+        self.handler = handler
+        self.deps = deps
+        # inline: run on the main loop (instant answers, or the command
+        # needs the microphone itself) instead of the background executor
+        self.inline = inline
+        # Seconds before a background command is given up on
+        self.timeout = timeout
+        # interrupt: the phrases are also heard while Edith is talking
+        self.interrupt = interrupt
+        self._function = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._function is None:
+                for dep in self.deps:
+                    import_timed(dep)
+                module, _, function = self.handler.partition(":")
+                self._function = getattr(import_timed(module), function)
+        return self._function
+
+    def __call__(self, text):
+        record_use(self.name)
+        return self.load()(text)
+
+    def __repr__(self):
+        return f"Command({self.name!r})"
+
+
+COMMANDS = [
+    Command("name", ["your name"], "commands:cmd_name", inline=True),
+    Command("age", ["old are you"], "commands:cmd_age", inline=True),
+    Command("time", ["now time"], "commands:cmd_time", inline=True),
+    Command("youtube", ["youtube"], "commands:cmd_youtube"),
+    Command("portfolio", ["portfolio"], "commands:cmd_portfolio"),
+    Command("joke", ["joke"], "commands:cmd_joke", deps=("pyjokes",)),
+    Command("play_video", ["play video"], "commands:cmd_play_video"),
+    Command("wikipedia", ["wikipedia"], "commands:cmd_wikipedia",
+            deps=("wikipedia",), timeout=15),
+    Command("search", ["search"], "commands:cmd_search",
+            deps=("pywhatkit",), timeout=15),
+    Command("play_song", ["play"], "commands:cmd_play_song",
+            deps=("pywhatkit",), timeout=15),
+    Command("screenshot", ["screenshot"], "commands:cmd_screenshot",
+            deps=("pyautogui",)),
+    Command("open_notepad", ["open notepad"], "commands:cmd_open_notepad"),
+    Command("open_calculator", ["open calculator"],
+            "commands:cmd_open_calculator"),
+    Command("battery", ["battery"], "commands:cmd_battery", deps=("psutil",)),
+    Command("system_health", ["system health", "cpu usage"],
+            "commands:cmd_system_health", deps=("psutil",)),
+    Command("check_disk", ["check disk"], "commands:cmd_check_disk",
+            deps=("psutil",)),
+    Command("volume_up", ["volume up"], "commands:cmd_volume_up",
+            deps=("pyautogui",), inline=True),
+    Command("volume_down", ["volume down"], "commands:cmd_volume_down",
+            deps=("pyautogui",), inline=True),
+    Command("mute", ["mute"], "commands:cmd_mute", deps=("pyautogui",),
+            inline=True),
+    Command("weather", ["weather"], "commands:cmd_weather",
+            deps=("pywhatkit",), timeout=15),
+    Command("date", ["date today"], "commands:cmd_date", inline=True),
+    Command("ip", ["ip address"], "commands:cmd_ip", deps=("requests",),
+            timeout=10),
+    Command("close_notepad", ["close notepad"], "commands:cmd_close_notepad"),
+    Command("close_calculator", ["close calculator"],
+            "commands:cmd_close_calculator"),
+    Command("make_note", ["make a note"], "commands:cmd_make_note",
+            deps=("notes_store",), inline=True),
+    # "read notes about groceries", "read last five notes"
+    Command("read_notes", ["read notes", "read my notes", "read last",
+                           "read the last"],
+            "commands:cmd_read_notes", deps=("notes_store",)),
+    Command("read_more_notes", ["read more notes", "more notes", "read more"],
+            "commands:cmd_read_more_notes", deps=("notes_store",)),
+    Command("cancel", ["cancel", "never mind"], "commands:cmd_cancel",
+            inline=True, interrupt=True),
+    Command("exit", ["exit", "stop"], "commands:cmd_exit", inline=True,
+            interrupt=True),
+]
+
+# Phrase -> command, in the form command_matcher expects. Commands are
+# called with the words spoken around the phrase (e.g. the search query).
+COMMAND_MAP = {phrase: command for command in COMMANDS
+               for phrase in command.phrases}
+# Phrases that can cut Edith off mid-sentence
+INTERRUPT_PHRASES = [phrase for command in COMMANDS if command.interrupt
+                     for phrase in command.phrases]
+
+import_times = {}
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+def import_timed(name):
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    import_times.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+def record_use(name):
+    with _usage_lock:
+        _usage[name] = _usage.get(name, 0) + 1
+
+
+def load_usage():
+    try:
+        with open(USAGE_FILE) as f:
+            _usage.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+
+def save_usage():
+    with _usage_lock:
+        counts = dict(_usage)
+    if not counts:
+        return
+    try:
+        with open(USAGE_FILE, "w") as f:
+            json.dump(counts, f)
+    except OSError as e:
+        print(f"Could not save command usage: {e}")
+
+
+def prewarm(count=PREWARM_COUNT):
+    # Import the most-used commands in the background, so their first use
+    # this session doesn't pay for the import
+    by_name = {command.name: command for command in COMMANDS}
+    with _usage_lock:
+        favourites = sorted(_usage, key=_usage.get, reverse=True)[:count]
+
+    def run():
+        for name in favourites:
+            command = by_name.get(name)
+            if command is None:
+                continue
+            try:
+                command.load()
+            except Exception as e:
+                print(f"Pre-warming {name} failed: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+load_usage()
+atexit.register(save_usage)
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_matcher import CommandMatcher  # noqa: E402
+from registry import COMMAND_MAP  # noqa: E402
+
+matcher = CommandMatcher(COMMAND_MAP)
+
+
+def matched(text):
+    match = matcher.match(text)
+    return match.handler.name if match else None
+
+
+@pytest.mark.parametrize("text", [
+    "does life exist on mars",
+    "how many planets exist",
+    "i love stomp music",
+    "cancer research",
+    "plays by shakespeare",
+])
+def test_near_miss_words_do_not_trigger_commands(text):
+    assert matched(text) is None
+
+
+@pytest.mark.parametrize("text, command", [
+    ("exit", "exit"),
+    ("stop", "exit"),
+    ("cancel that", "cancel"),
+    ("play despacito", "play_song"),
+    ("play video of cats", "play_video"),
+])
+def test_exact_phrases_match(text, command):
+    assert matched(text) == command
+
+
+def test_spelling_slip_in_a_longer_phrase_is_corrected():
+    match = matcher.match("open calculater")
+    assert match.handler.name == "open_calculator"
+    assert match.fuzzy
+
+
+def test_spelling_slip_alone_is_not_corrected():
+    assert matched("wikipedea") is None
@@ -1,18 +1,225 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
 import pyttsx3
+from phrase_cache import PhraseCache
 
-def speak(text):
-    print(f"Edith: {text}")
-    try:
-        engine = pyttsx3.init()
+VOICE_INDEX = 1
+RATE = 150
+# Seconds of quiet before phrases are pre-rendered
+RENDER_IDLE = 1.0
+
+
+class Speaker:
+    # One pyttsx3 engine, created once and owned by a worker thread.
+    # speak() only queues text, so callers never wait on engine start-up.
+
+    def __init__(self, voice_index=VOICE_INDEX, rate=RATE):
+        self.voice_index = voice_index
+        self.rate = rate
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self._ready = threading.Event()
+        self._generation = 0
+        self._current = None
+        self._engine = None
+        self._thread = None
+        self.startup_seconds = None
+        self.latencies = []
+        self.phrases = PhraseCache()
+        self._reconfigure = False
+        self._last_spoke = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _configure(self, engine):
         voices = engine.getProperty("voices")
-        if len(voices) > 1:
-            engine.setProperty("voice", voices[1].id)
-        else:
+        if len(voices) > self.voice_index:
+            engine.setProperty("voice", voices[self.voice_index].id)
+        elif voices:
             engine.setProperty("voice", voices[0].id)
-        engine.setProperty("rate", 150)
-        engine.say(text)
-        engine.runAndWait()
-        engine.stop()
-        del engine
-    except Exception as e:
-        print(f"Speech error: {e}")
+        engine.setProperty("rate", self.rate)
+        # Cached audio is only valid for the voice it was rendered with
+        self.phrases.set_voice(f"{engine.getProperty('voice')}|"
+                               f"{engine.getProperty('rate')}")
+
+    def _on_start(self, name):
+        item = self._current
+        if item is not None:
+            self.latencies.append(time.perf_counter() - item["queued"])
+
+    def _on_word(self, name, location, length):
+        # Barge-in: stopping from inside the engine's own callback is the
+        # one place pyttsx3 reliably honours it
+        item = self._current
+        if item is not None and item["generation"] != self._generation:
+            self._engine.stop()
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self._engine = pyttsx3.init()
+            self._configure(self._engine)
+            self._engine.connect("started-utterance", self._on_start)
+            self._engine.connect("started-word", self._on_word)
+        except Exception as e:
+            print(f"Speech error: {e}")
+            self._engine = None
+        self.startup_seconds = time.perf_counter() - started
+        self._ready.set()
+
+        while True:
+            # Pre-render phrases once speech has been quiet for a while
+            idle = None
+            if self._engine and self.phrases.waiting():
+                idle = max(0, self._last_spoke + RENDER_IDLE
+                           - time.perf_counter())
+            try:
+                item = self._queue.get(timeout=idle)
+            except queue.Empty:
+                item = None
+            try:
+                if self._engine and self._reconfigure:
+                    self._reconfigure = False
+                    self._configure(self._engine)
+                if item is None:
+                    self.phrases.render_next(self._engine)
+            except Exception as e:
+                print(f"Speech error: {e}")
+            if item is None:
+                continue
+            try:
+                if self._engine and item["generation"] == self._generation:
+                    self._current = item
+                    self._speak(item)
+            except Exception as e:
+                print(f"Speech error: {e}")
+            finally:
+                self._current = None
+                self._last_spoke = time.perf_counter()
+                item["done"].set()
+                self._finished()
+
+    def _speak(self, item):
+        text = item["text"]
+        clip = self.phrases.get(text)
+        played = False
+        if clip is not None:
+            self.latencies.append(time.perf_counter() - item["queued"])
+            try:
+                self.phrases.play(clip)
+                played = True
+            except Exception as e:
+                # No usable output device; the engine may still manage
+                print(f"Cached speech failed, speaking live: {e}")
+                self.phrases.enabled = False
+        if not played:
+            self._engine.say(text)
+            self._engine.runAndWait()
+        self.phrases.note_use(text)
+
+    def _finished(self):
+        with self._lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.set()
+
+    def say(self, text, block=False):
+        print(f"Edith: {text}")
+        self.start()
+        item = {
+            "text": text,
+            "generation": self._generation,
+            "queued": time.perf_counter(),
+            "done": threading.Event(),
+        }
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+        self._queue.put(item)
+        if block:
+            item["done"].wait()
+
+    def set_voice(self, voice_index=None, rate=None):
+        # Takes effect from the next sentence and drops the cached phrases
+        if voice_index is not None:
+            self.voice_index = voice_index
+        if rate is not None:
+            self.rate = rate
+        self._reconfigure = True
+
+    def wait(self, timeout=None):
+        return self._idle.wait(timeout)
+
+    def wait_ready(self, timeout=None):
+        self.start()
+        return self._ready.wait(timeout)
+
+    def speaking(self):
+        # Text of the sentence being spoken, or None
+        item = self._current
+        return item["text"] if item is not None else None
+
+    def interrupt(self):
+        # Drop everything queued and cut off the sentence being spoken
+        self._generation += 1
+        self.phrases.stop()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            item["done"].set()
+            self._finished()
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "startup_seconds": self.startup_seconds,
+            "utterances": len(latencies),
+            "median_latency": latencies[len(latencies) // 2] if latencies else None,
+            "phrase_cache": self.phrases.stats(),
+        }
+
+
+speaker = Speaker()
+_local = threading.local()
+
+
+def speak(text, block=False):
+    sink = getattr(_local, "sink", None)
+    if sink is not None:
+        sink(text, block)
+    else:
+        speaker.say(text, block=block)
+
+
+@contextmanager
+def speech_sink(sink):
+    # Route speak() calls made on this thread to sink(text, block)
+    previous = getattr(_local, "sink", None)
+    _local.sink = sink
+    try:
+        yield
+    finally:
+        _local.sink = previous
+
+
+def wait_until_done(timeout=None):
+    return speaker.wait(timeout)
+
+
+def stop_speaking():
+    speaker.interrupt()
+
+
+def now_speaking():
+    return speaker.speaking()
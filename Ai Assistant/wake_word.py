@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+import speech_recognition as sr
+
+# Say the wake word, then the command ("Edith, what time is it"). Set
+# EDITH_WAKE_WORD to an empty string to send every utterance upstream.
+WAKE_WORD = os.getenv("EDITH_WAKE_WORD", "edith").lower()
+# Small Vosk model for spotting; the recognition model is used if unset
+WAKE_MODEL = os.getenv("EDITH_WAKE_MODEL", "")
+
+SPOT_SECONDS = 2.0        # only the start of an utterance is searched
+MIN_COMMAND = 0.4         # seconds left after the wake word to count as a command
+FOLLOW_UP = 8.0           # after "Edith" alone, the next utterance goes through
+
+
+def model_loader(path):
+    # Loads the spotting model once, on first call
+    lock = threading.Lock()
+    model = []
+
+    def load():
+        with lock:
+            if not model:
+                import vosk
+                vosk.SetLogLevel(-1)
+                model.append(vosk.Model(path))
+        return model[0]
+    return load
+
+
+class WakeWordGate:
+    # On-device keyword spotting in front of the recognizer. Vosk decodes
+    # the first couple of seconds of each utterance against a two-entry
+    # grammar (the wake word or anything else), which is far cheaper than
+    # full recognition and never leaves the machine.
+
+    def __init__(self, load_model, keyword=WAKE_WORD, samplerate=16000):
+        self.load_model = load_model
+        self.keyword = keyword
+        self.samplerate = samplerate
+        self.armed_until = 0.0
+        self._lock = threading.Lock()
+        self._counts = {"utterances": 0, "woken": 0, "follow_ups": 0,
+                        "rejected": 0}
+        self._spot_seconds = 0.0
+        self._started = time.monotonic()
+        self._cpu_started = time.process_time()
+
+    def warm_up(self):
+        self.load_model()
+
+    def _spot(self, data):
+        # Seconds into the audio where the wake word ends, or None
+        import vosk
+        decoder = vosk.KaldiRecognizer(self.load_model(), self.samplerate,
+                                       json.dumps([self.keyword, "[unk]"]))
+        decoder.SetWords(True)
+        decoder.AcceptWaveform(data[:int(SPOT_SECONDS * self.samplerate) * 2])
+        for word in json.loads(decoder.FinalResult()).get("result", []):
+            if word["word"] == self.keyword:
+                return word["end"]
+        return None
+
+    def spot_phrases(self, audio, phrases):
+        # The utterance decoded against just ``phrases``, with anything else
+        # as [unk]; cheap enough to run on everything heard while Edith talks
+        import vosk
+        data = audio.get_raw_data(convert_rate=self.samplerate,
+                                  convert_width=2)
+        decoder = vosk.KaldiRecognizer(self.load_model(), self.samplerate,
+                                       json.dumps([*phrases, "[unk]"]))
+        decoder.AcceptWaveform(data)
+        return json.loads(decoder.FinalResult()).get("text", "")
+
+    def admit(self, audio):
+        # Returns the audio to recognize (with the wake word cut off),
+        # True if only the wake word was said, or None to drop it
+        self._count("utterances")
+        if time.monotonic() < self.armed_until:
+            self.armed_until = 0.0
+            self._count("follow_ups")
+            return audio
+
+        data = audio.get_raw_data(convert_rate=self.samplerate,
+                                  convert_width=2)
+        started = time.perf_counter()
+        end = self._spot(data)
+        with self._lock:
+            self._spot_seconds += time.perf_counter() - started
+        if end is None:
+            self._count("rejected")
+            return None
+
+        self._count("woken")
+        rest = data[int(end * self.samplerate) * 2:]
+        if len(rest) < MIN_COMMAND * self.samplerate * 2:
+            self.armed_until = time.monotonic() + FOLLOW_UP
+            return True
+        return sr.AudioData(rest, self.samplerate, 2)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self, upstream_calls):
+        hours = max(time.monotonic() - self._started, 1) / 3600
+        with self._lock:
+            stats = dict(self._counts)
+            spot_ms = self._spot_seconds * 1000
+        checked = stats["woken"] + stats["rejected"]
+        stats["spot_ms_mean"] = round(spot_ms / checked, 1) if checked else 0
+        stats["upstream_calls_per_hour"] = round(upstream_calls / hours, 1)
+        stats["cpu_percent"] = round(
+            (time.process_time() - self._cpu_started) / (hours * 36), 1)
+        return stats